@@ -0,0 +1,31 @@
+import os
+import sys
+import time
+import contextlib
+from typing import *
+
+
+@contextlib.contextmanager
+def null_stdout():
+    """
+    Redirect the standard output to os.devnull, so the cost of the terminal is not measured.
+    """
+    with open(os.devnull, "w") as sink:
+        with contextlib.redirect_stdout(sink):
+            yield sink
+
+
+def measure(fn: Callable[[], Any], number: int = 1, repeat: int = 5) -> float:
+    """
+    Time a function. The best of the repeats is kept, since the noise of the machine can only make it slower.
+    :param fn: The function to time
+    :param number: The number of operations done by one call of the function
+    :param repeat: The number of times the function is timed
+    :return: The duration of one operation in nanoseconds
+    """
+    best = sys.maxsize
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        fn()
+        best = min(best, time.perf_counter_ns() - start)
+    return best / number
@@ -0,0 +1,44 @@
+"""
+Time to load and validate a synthetic configuration file with thousands of keys.
+"""
+import os
+import tempfile
+import yaml
+from pyutils import ConfigFile, RaiseType
+from _timing import measure
+
+N_SECTIONS = 50
+N_KEYS = 100
+
+
+def make_config() -> tuple:
+    config = {}
+    config_format = {}
+    for s in range(N_SECTIONS):
+        section = {}
+        section_format = {}
+        for k in range(N_KEYS):
+            if k % 3 == 0:
+                section[f"key{k}"], section_format[f"key{k}"] = k, int
+            elif k % 3 == 1:
+                section[f"key{k}"], section_format[f"key{k}"] = k / 10, float
+            else:
+                section[f"key{k}"], section_format[f"key{k}"] = f"value{k}", str
+        config[f"section{s}"] = section
+        config_format[f"section{s}"] = section_format
+    return config, config_format
+
+
+def run() -> dict:
+    config, config_format = make_config()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "config.yml")
+        with open(path, "w") as f:
+            yaml.safe_dump(config, f)
+        load = measure(lambda: ConfigFile(path, error_notif=RaiseType.RAISE), repeat=3)
+        validate = measure(lambda: ConfigFile(path, config_format=config_format, error_notif=RaiseType.RAISE), repeat=3)
+    n_keys = N_SECTIONS * N_KEYS
+    return {
+        f"configFile.load.{n_keys}keys": dict(value=load, unit="ns/op"),
+        f"configFile.load_validate.{n_keys}keys": dict(value=validate, unit="ns/op"),
+    }
@@ -0,0 +1,19 @@
+"""
+Cost of a call to pyutils.logger.info, formatting and writing included (To a null sink).
+"""
+from pyutils import logger
+from _timing import measure, null_stdout
+
+N = 10_000
+
+
+def log_info():
+    for i in range(N):
+        logger.info("Processing item")
+
+
+def run() -> dict:
+    # The handler is bound to sys.stdout when the logger is first used, so it must be redirected before
+    with null_stdout():
+        value = measure(log_info, N)
+    return {"logger.info": dict(value=value, unit="ns/call")}
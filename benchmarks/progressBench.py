@@ -0,0 +1,47 @@
+"""
+Overhead of the progress bar per iteration, compared to a bare loop. The bar is drawn (output='tty') to a null sink.
+Also, the cost of creating a bar, or reusing one with `reset`, for short inner loops.
+"""
+from pyutils import progress
+from _timing import measure, null_stdout
+
+N = 1_000_000
+
+
+def bare_loop():
+    for _ in range(N):
+        pass
+
+def make_progress_loop(type: str):
+    def loop():
+        for _ in progress(range(N), type=type, output="tty"):
+            pass
+    return loop
+
+N_BARS = 50_000
+INNER = range(10)
+
+def construct():
+    for _ in range(N_BARS):
+        progress(INNER, output="tty")
+
+def make_reset():
+    bar = progress(output="tty")
+    def reset():
+        for _ in range(N_BARS):
+            bar.reset(INNER)
+    return reset
+
+
+def run() -> dict:
+    results = {}
+    with null_stdout():
+        bare = measure(bare_loop, N, repeat=7)
+        results["loop.bare"] = dict(value=bare, unit="ns/it")
+        for type in ("default", "dl", "pip"):
+            value = measure(make_progress_loop(type), N, repeat=7)
+            results[f"progress.{type}"] = dict(value=value, unit="ns/it")
+            results[f"progress.{type}.overhead"] = dict(value=value - bare, unit="ns/it")
+        results["progress.construct"] = dict(value=measure(construct, N_BARS), unit="ns/op")
+        results["progress.reset"] = dict(value=measure(make_reset(), N_BARS), unit="ns/op")
+    return results
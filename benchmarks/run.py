@@ -0,0 +1,103 @@
+"""
+Run the benchmarks of pyutils and compare them against a baseline.
+
+Usage:
+    python benchmarks/run.py                                  # Run all benchmarks
+    python benchmarks/run.py progress logger                  # Run some benchmarks
+    python benchmarks/run.py --output results.json            # Save the results
+    python benchmarks/run.py --baseline baseline.json         # Compare against a baseline
+
+The results are saved as JSON: {"meta": {...}, "results": {name: {"value": ..., "unit": ...}}}. When a baseline is
+given, the ratio of each result against the baseline is displayed, and the exit code is 1 if a result is slower than
+the baseline by more than the tolerance.
+"""
+import os
+import sys
+import json
+import argparse
+import platform
+import importlib
+from datetime import datetime
+from typing import *
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Benchmark the working tree, not the installed package
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pyutils import __version__
+
+SUITES = ("progress", "spinner", "logger", "configFile", "traceback")
+
+
+def run_suites(names: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for name in names:
+        module = importlib.import_module(f"{name}Bench")
+        print(f"Running {name}...", file=sys.stderr)
+        results.update(module.run())
+    return results
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float) -> bool:
+    """
+    Print the results next to the baseline.
+    :return: True if no result regressed by more than the tolerance
+    """
+    ok = True
+    width = max(len(name) for name in results)
+    print(f"{'benchmark':<{width}}  {'value':>14}  {'baseline':>14}  {'ratio':>7}")
+    for name, result in results.items():
+        value = result["value"]
+        ref = baseline.get(name)
+        if ref is None or ref["value"] <= 0:
+            print(f"{name:<{width}}  {value:>14.1f}  {'-':>14}  {'-':>7}  {result['unit']}")
+            continue
+        ratio = value / ref["value"]
+        regressed = ratio > 1 + tolerance
+        if regressed:
+            ok = False
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<{width}}  {value:>14.1f}  {ref['value']:>14.1f}  {ratio:>7.2f}  {result['unit']}{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmarks of pyutils")
+    parser.add_argument("suites", nargs="*", help=f"The suites to run: {', '.join(SUITES)} (Default: all)")
+    parser.add_argument("--output", "-o", help="Save the results in this JSON file")
+    parser.add_argument("--baseline", "-b", help="Compare the results against this JSON file")
+    parser.add_argument("--tolerance", "-t", type=float, default=0.10,
+                        help="Relative slowdown allowed before a result is a regression (Default: 0.10)")
+    args = parser.parse_args()
+    for name in args.suites:
+        if name not in SUITES:
+            parser.error(f"Unknown suite: {name}. Expected one of {', '.join(SUITES)}")
+
+    results = run_suites(args.suites or SUITES)
+    report = dict(
+        meta=dict(
+            version=__version__,
+            python=platform.python_version(),
+            implementation=platform.python_implementation(),
+            machine=platform.machine(),
+            system=platform.system(),
+            date=datetime.now().isoformat(timespec="seconds")
+        ),
+        results=results
+    )
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["results"]
+        ok = compare(results, baseline, args.tolerance)
+        sys.exit(0 if ok else 1)
+    else:
+        compare(results, {}, args.tolerance)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+"""
+Time to start and stop a spinner. It is the latency added to the task wrapped by the spinner.
+"""
+from pyutils import Spinner
+from _timing import measure, null_stdout
+
+N = 5
+
+
+def start_stop():
+    for _ in range(N):
+        with Spinner("Loading"):
+            pass
+
+
+def run() -> dict:
+    with null_stdout():
+        value = measure(start_stop, N, repeat=3)
+    return {"spinner.start_stop": dict(value=value, unit="ns/op")}
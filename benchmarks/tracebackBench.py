@@ -0,0 +1,25 @@
+"""
+Time to format and print a deep traceback with TraceBackColor (To a null sink).
+"""
+import sys
+from pyutils import TraceBackColor
+from _timing import measure, null_stdout
+
+DEPTH = 200
+
+
+def recurse(n: int):
+    if n == 0:
+        raise ValueError("Deep error")
+    recurse(n - 1)
+
+
+def run() -> dict:
+    try:
+        recurse(DEPTH)
+    except ValueError:
+        exc_info = sys.exc_info()
+    hook = TraceBackColor()
+    with null_stdout():
+        value = measure(lambda: hook(*exc_info), repeat=10)
+    return {f"traceback.depth{DEPTH}": dict(value=value, unit="ns/op")}
@@ -1,5 +1,11 @@
 from .color import BaseColor, Color, ResetColor, RGBColor, BackgroundColor, Colors, TraceBackColor, ColorPalette
 from .configFile import ConfigFile, RaiseType, Profile, Default, ConfigFormat, Option, Options, Tag
 from .progress import progress, prange
+from .progressGroup import ProgressGroup
+from .sharedCounters import SharedCounters
+from .progressStats import ProgressStats, WindowedStats, Aggregator
+from .progressMetrics import MetricsExporter
+from .progressHistory import MetricsHistory
+from .progressCollector import ProgressReporter, ProgressCollector
 from .spinner import Spinner
 from .__version__ import __version__
\ No newline at end of file
@@ -1,12 +1,107 @@
 import time
+import threading
+import asyncio
+import sys
 from datetime import datetime, timedelta
 from .color import BaseColor, Color, Colors, ResetColor
+from .sharedCounters import SharedCounters
+from .progressStats import ProgressStats, WindowedStats, Aggregator, make_aggregator, RenderStats
+from .spinner import get_frames
+from .progressMetrics import MetricsExporter
+from .progressHistory import MetricsHistory
 import math
 from typing import *
 import shutil
-from copy import deepcopy
 import os
+import io
 import re
+import signal
+import json
+import unicodedata
+import warnings
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+from operator import attrgetter
+if TYPE_CHECKING:
+    from .progressGroup import ProgressGroup
+    from .progressCollector import ProgressReporter
+
+# Color escape sequences (Not visible in the terminal)
+_ESC_RE = re.compile(r'\x1b\[.*?m')
+_RESET = str(ResetColor())
+
+# --------------------- Terminal size --------------------- #
+# The terminal size is cached, and invalidated when the terminal is resized (SIGWINCH). If the signal handler can't be
+# installed (Windows, or not in the main thread), the size is polled every _TERM_POLL_NS instead.
+_TERM_POLL_NS = 1_000_000_000
+_term_columns: Optional[int] = None
+_term_polled_ns = 0
+_winch_installed = False
+_prev_winch_handler = None
+
+def _on_sigwinch(signum, frame):
+    global _term_columns
+    _term_columns = None
+    if callable(_prev_winch_handler):
+        _prev_winch_handler(signum, frame)
+
+def _install_winch_handler():
+    global _winch_installed, _prev_winch_handler
+    if not hasattr(signal, "SIGWINCH") or threading.current_thread() is not threading.main_thread():
+        return
+    try:
+        _prev_winch_handler = signal.getsignal(signal.SIGWINCH)
+        signal.signal(signal.SIGWINCH, _on_sigwinch)
+        _winch_installed = True
+    except (ValueError, OSError):
+        pass
+
+def get_terminal_columns() -> int:
+    """
+    Get the number of columns of the terminal. The value is cached until the terminal is resized.
+    """
+    global _term_columns, _term_polled_ns
+    if not _winch_installed:
+        _install_winch_handler()
+        now = time.perf_counter_ns()
+        if now - _term_polled_ns > _TERM_POLL_NS:
+            _term_columns = None
+            _term_polled_ns = now
+    if _term_columns is None:
+        _term_columns = shutil.get_terminal_size().columns
+    return _term_columns
+
+# The result is cached for the current sys.stdout object (It is checked at each progress bar creation)
+_interactive_cache: Tuple[Any, bool] = (None, False)
+
+def _is_interactive() -> bool:
+    """
+    Check if the standard output supports redrawing a line (terminal, PyCharm console or Jupyter notebook)
+    """
+    global _interactive_cache
+    stdout = sys.stdout
+    if _interactive_cache[0] is stdout and stdout is not None:
+        return _interactive_cache[1]
+    if "PYCHARM_HOSTED" in os.environ or "ipykernel" in sys.modules:
+        interactive = True
+    else:
+        try:
+            interactive = stdout.isatty()
+        except (AttributeError, ValueError):
+            interactive = False
+    _interactive_cache = (stdout, interactive)
+    return interactive
+
+def static_widget(cb: Callable[['progress'], str]) -> Callable[['progress'], str]:
+    """
+    Decorator to mark a widget as static: its output only depends on parameters that do not change during the
+    iteration. It is then rendered once per progress bar and cached, with its visible width.
+    """
+    cb.static = True
+    return cb
 
 # --------------------- Default/tqdm progress bar CB--------------------- #
 def format_seconds_to_hms(seconds):
@@ -32,23 +127,36 @@ def pretty_time_format(seconds: float):
         return f"{seconds // 3600:.0f}h {(seconds % 3600) // 60:.0f}m"
 
 def format_percent(self: 'progress'):
-    return f"{(self.count / self.total) * 100:.0f}%"
+    fraction = self.frame.fraction
+    if fraction is None:
+        return ""
+    return f"{fraction * 100:.0f}%"
 
+@static_widget
 def format_desc(self: 'progress'):
     return f"{self.desc}:" if self.desc is not None and self.desc != "" else ""
 
 
 def format_total(self: 'progress'):
+    if self.total is None:
+        return f"{self.count}"
     return f"{self.count}/{self.total}"
 
 def format_eta(self: 'progress'):
-    if self.ema == 0:
-        return "[00:00<00:00, 0.00it/s]"
-    elapsed = (datetime.now() - self.start_time).total_seconds()
-    eta = (self.total - self.count) * self.ema
-    it_per_sec = 1 / self.ema
+    frame = self.frame
+    it_per_sec = frame.rate
+    if it_per_sec == 0:
+        return "[00:00, 0.00it/s]" if self.total is None else "[00:00<00:00, 0.00it/s]"
+    elapsed = frame.elapsed
+    eta = frame.eta
+    if eta is None:
+        # Unknown total
+        if it_per_sec < 1:
+            return f"[{format_seconds_to_hms(elapsed)}, {frame.time_per_step:.2f}s/it]"
+        else:
+            return f"[{format_seconds_to_hms(elapsed)}, {it_per_sec:.2f}it/s]"
     if it_per_sec < 1:
-        return f"[{format_seconds_to_hms(elapsed)}<{format_seconds_to_hms(eta)}, {self.ema:.2f}s/it]"
+        return f"[{format_seconds_to_hms(elapsed)}<{format_seconds_to_hms(eta)}, {frame.time_per_step:.2f}s/it]"
     else:
         return f"[{format_seconds_to_hms(elapsed)}<{format_seconds_to_hms(eta)}, {it_per_sec:.2f}it/s]"
 
@@ -59,24 +167,75 @@ def format_added_values(self: 'progress'):
 
 def format_pip_total(self: 'progress'):
     unit = self.added_values.get("unit", "it")
+    if self.total is None:
+        return f"{Color(2)}{self.count} {unit}{ResetColor()}"
     if isinstance(self.total, int):
         return f"{Color(2)}{self.count}/{self.total} {unit}{ResetColor()}"
     else:
         return f"{Color(2)}{self.count:.2f}/{self.total:.2f} {unit}{ResetColor()}"
 
 def format_speed(self: 'progress'):
-    if self.ema == 0:
+    it_per_sec = self.frame.rate
+    if it_per_sec == 0:
         return ""
-    it_per_sec = 1 / self.ema
     unit = self.added_values.get("unit", "it")
     return f"{Color(1)}{it_per_sec:.2f} {unit}/s{ResetColor()}"
 
 def format_pip_eta(self: 'progress'):
-    if self.ema == 0:
+    frame = self.frame
+    if frame.rate == 0:
         return "[00:00<00:00, 0.00it/s]"
-    eta = (self.total - self.count) * self.ema
+    eta = frame.eta
+    if eta is None:
+        return f"elapsed {Color(6)}{format_seconds_to_hms(frame.elapsed)}{ResetColor()}"
     return f"eta {Color(6)}{format_seconds_to_hms(eta)}{ResetColor()}"
 
+# --------------------- Bytes progress bar CB--------------------- #
+_BYTE_UNITS = ("B", "kB", "MB", "GB", "TB", "PB")
+
+def scale_bytes(n: float) -> Tuple[float, str]:
+    """
+    Scale a number of bytes to the most appropriate unit (B, kB, MB, GB, TB, PB). Units are powers of 1000.
+    :param n: The number of bytes
+    :return: The scaled number and its unit
+    """
+    i = 0
+    while abs(n) >= 1000 and i < len(_BYTE_UNITS) - 1:
+        n /= 1000
+        i += 1
+    return n, _BYTE_UNITS[i]
+
+def format_bytes_total(self: 'progress'):
+    """
+    Format the count and the total in the unit of the total: 1.2/4.0 GB
+    """
+    _, unit = scale_bytes(self.total if self.total is not None else self.count)
+    factor = 1000 ** _BYTE_UNITS.index(unit)
+    fmt = ".0f" if unit == "B" else ".1f"
+    if self.total is None:
+        return f"{Color(2)}{self.count / factor:{fmt}} {unit}{ResetColor()}"
+    return f"{Color(2)}{self.count / factor:{fmt}}/{self.total / factor:{fmt}} {unit}{ResetColor()}"
+
+def format_bytes_speed(self: 'progress'):
+    """
+    Format the throughput: 35.2 MB/s
+    """
+    rate = self.frame.rate
+    if rate == 0:
+        return ""
+    speed, unit = scale_bytes(rate)
+    return f"{Color(1)}{speed:.1f} {unit}/s{ResetColor()}"
+
+# --------------------- Multiprocessing CB--------------------- #
+def format_worker_speed(self: 'progress'):
+    """
+    Format the speed of the slowest and the fastest worker: workers 12.05-14.50 it/s
+    """
+    if len(self.worker_rates) == 0:
+        return ""
+    unit = self.added_values.get("unit", "it")
+    return f"workers {min(self.worker_rates):.2f}-{max(self.worker_rates):.2f} {unit}/s"
+
 
 # --------------------- DL progress bar CB--------------------- #
 def format_time_per_step(done_color: Optional[BaseColor] = Colors.success):
@@ -87,10 +246,11 @@ def format_time_per_step(done_color: Optional[BaseColor] = Colors.success):
         color = done_color if self.iter_ended else Colors.secondary
         if color is None:
             color = Colors.green
-        if self.ema == 0:
+        frame = self.frame
+        if frame.rate == 0:
             return f"{color}NA/step{ResetColor()}"
         else:
-            time_per_step = self.ema
+            time_per_step = frame.time_per_step
             if time_per_step < 1e-6:
                 time_per_step *= 1e9
                 return f"{color}{time_per_step:.2f} ns/step{ResetColor()}"
@@ -108,18 +268,31 @@ def format_dl_eta(self: 'progress'):
     """
     While training, the eta is shown: 9s; when done, it shows the elapsed time: 1h 30m
     """
-    if self.ema == 0:
+    frame = self.frame
+    if frame.rate == 0:
         return f"{Colors.accent}NA{ResetColor()}"
-    elapsed = (datetime.now() - self.start_time).total_seconds()
+    elapsed = frame.elapsed
     if self.iter_ended:
         if self.done_color is not None:
             return f"{self.done_color}{pretty_time_format(elapsed)}{ResetColor()}"
         else:
             return f"{Colors.primary}{pretty_time_format(elapsed)}{ResetColor()}"
     else:
-        eta = (self.total - self.count) * self.ema
+        eta = frame.eta
+        if eta is None:
+            # Unknown total: show the elapsed time instead
+            return f"{Colors.primary}{pretty_time_format(elapsed)}{ResetColor()}"
         return f"{Colors.primary}{pretty_time_format(eta)}{ResetColor()}"
 
+def format_phases(self: 'progress'):
+    """
+    Format the share of the time spent in each phase of the steps: data 35% | compute 65%
+    """
+    shares = self.phase_shares
+    if len(shares) == 0:
+        return ""
+    return " | ".join(f"{name} {share:.0%}" for name, share in shares.items())
+
 def format_sep(self: 'progress'):
     """
     Format a separator: ' | ' that appears only if there are added values
@@ -128,11 +301,106 @@ def format_sep(self: 'progress'):
         return ""
     else:
         return " | "
+class FrameContext:
+    """
+    The values shared by the widgets of a frame. They are computed once per frame (One clock read), instead of once per
+    widget. Widgets get it with `bar.frame`. During a frame, the `elapsed`, `rate`, `time_per_step` and `eta`
+    properties of the bar also return these values, so the widgets that use them are consistent and cheap.
+    """
+    __slots__ = ("now", "count", "elapsed", "rate", "time_per_step", "eta", "fraction", "term_width")
+
+    def __init__(self, now: int, count: int, elapsed: float, rate: float, eta: Optional[float],
+                 fraction: Optional[float], term_width: int):
+        """
+        :param now: The time of the frame given by time.perf_counter_ns
+        :param count: The count of the bar
+        :param elapsed: The elapsed time in seconds
+        :param rate: The number of steps per second. 0 if unknown.
+        :param eta: The estimated remaining time in seconds. None if unknown.
+        :param fraction: The fraction done, between 0 and 1. None if the total is unknown.
+        :param term_width: The width of the terminal (Columns)
+        """
+        self.now = now
+        self.count = count
+        self.elapsed = elapsed
+        self.rate = rate
+        self.time_per_step = 1 / rate if rate != 0 else 0.
+        self.eta = eta
+        self.fraction = fraction
+        self.term_width = term_width
+
+
+class _GateMonitor:
+    """
+    A daemon thread that keeps the count gate of the progress bars honest (Like tqdm's monitor thread). The clock is only
+    read every `_miniters` items, and `_miniters` grows while the items are fast. If the items then slow down, the next
+    clock read can be far away, and the bar would freeze. When a bar has not read the clock for more than its refresh
+    period, the monitor resets its gate, so the next item reads the clock.
+    """
+    # Time between two checks, in seconds
+    INTERVAL = 0.1
+
+    def __init__(self):
+        self._bars: 'weakref.WeakSet[progress]' = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, bar: 'progress'):
+        if bar in self._bars:
+            return
+        with self._lock:
+            self._bars.add(bar)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                bars = list(self._bars)
+                if len(bars) == 0:
+                    self._wake.clear()
+            if len(bars) == 0:
+                self._wake.wait()
+                continue
+            now = time.perf_counter_ns()
+            for bar in bars:
+                if bar.iter_ended or bar._renderer is not None or bar._render_task is not None:
+                    with self._lock:
+                        self._bars.discard(bar)
+                elif bar._miniters > 1 and now - bar._prev_step_ns > bar._refresh_ns:
+                    bar._miniters = 1
+                    bar._next_check = bar.count + 1
+            del bars
+            time.sleep(self.INTERVAL)
+
+
+_MONITOR = _GateMonitor()
+
+def _reset_monitor_after_fork():
+    # The thread of the parent does not exist in the child
+    global _MONITOR
+    _MONITOR = _GateMonitor()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_monitor_after_fork)
+
+
 class ProgressConfig:
     """
-    The configuration class for the progress bar. Each config is an instance of this object.
+    The configuration class for the progress bar. Each config is an instance of this object. It is immutable and
+    resolved once (Spinner frames, refresh period), so the progress bars only keep a reference to their config instead of
+    copying it. Use `replace` to derive a new config.
     You should not interact directly with this class, but rather use the `progress.set_config` method.
     """
+    # The parameters of the config, in the order of the constructor
+    FIELDS = ("desc", "cu", "cd", "max_width", "delim", "done_delim", "done_charac", "cursors", "refresh_rate", "end",
+              "enum", "ref", "ignore_term_width", "display", "threaded", "output", "log_interval", "log_step", "stats",
+              "spinner", "metrics", "pre_cb", "post_cb", "color", "done_color")
+    __slots__ = FIELDS + ("name", "frames", "refresh_ns", "check_ns")
+
     def __init__(self, desc: str = "", type: str = "default",
                  cu: str = "█", cd: str = " ", max_width: int = 50,
                  delim: Tuple[str, str] = ("|", "|"),
@@ -145,6 +413,13 @@ class ProgressConfig:
                  ref: bool = False,
                  ignore_term_width: bool = False,
                  display: bool = True,
+                 threaded: bool = False,
+                 output: Literal["auto", "tty", "text", "json"] = "auto",
+                 log_interval: float = 30.,
+                 log_step: float = 0.05,
+                 stats: Callable[[], ProgressStats] = WindowedStats,
+                 spinner: Union[str, Tuple[str, ...]] = "wave",
+                 metrics: Optional[MetricsExporter] = None,
                  pre_cb: Sequence[Callable[['progress'], str]] = (
                          format_desc,
                          format_percent,
@@ -156,27 +431,86 @@ class ProgressConfig:
                  ),
                  color: Optional[BaseColor] = None,
                  done_color: Optional[BaseColor] = None):
-        self.desc = desc
-        self.name = type
-        self.cu = cu
-        self.cd = cd
-        self.max_width = max_width
-        self.delim = delim
-        self.done_delim = done_delim
-        self.done_charac = done_charac
-        self.cursors = cursors
-        self.refresh_rate = refresh_rate
-        self.end = end
-        self.enum = enum
-        self.ref = ref
-        self.ignore_term_width = ignore_term_width
-        self.pre_cb = pre_cb
-        self.post_cb = post_cb
-        self.color = color
-        self.done_color = done_color
-        self.display = display
+        if output not in ("auto", "tty", "text", "json"):
+            raise ValueError(f"Unknown output: {output}")
+        init = object.__setattr__
+        init(self, "desc", desc)
+        init(self, "name", type)
+        init(self, "cu", cu)
+        init(self, "cd", cd)
+        init(self, "max_width", max_width)
+        init(self, "delim", tuple(delim))
+        init(self, "done_delim", tuple(done_delim))
+        init(self, "done_charac", done_charac)
+        init(self, "cursors", tuple(cursors))
+        init(self, "refresh_rate", refresh_rate)
+        init(self, "end", end)
+        init(self, "enum", enum)
+        init(self, "ref", ref)
+        init(self, "ignore_term_width", ignore_term_width)
+        init(self, "pre_cb", tuple(pre_cb))
+        init(self, "post_cb", tuple(post_cb))
+        init(self, "color", color)
+        init(self, "done_color", done_color)
+        init(self, "display", display)
+        init(self, "threaded", threaded)
+        init(self, "output", output)
+        init(self, "log_interval", log_interval)
+        init(self, "log_step", log_step)
+        init(self, "stats", stats)
+        init(self, "spinner", spinner)
+        init(self, "metrics", metrics)
+        # Resolved values
+        init(self, "frames", get_frames(spinner) if isinstance(spinner, str) else tuple(spinner))
+        init(self, "refresh_ns", int(refresh_rate * 1e9))
+        init(self, "check_ns", int(refresh_rate * 1e9) // 4)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("ProgressConfig is immutable. Use progress.set_config or ProgressConfig.replace instead.")
+
+    def replace(self, **changes) -> 'ProgressConfig':
+        """
+        Make a copy of the config with some parameters changed.
+        :param changes: The new values of the parameters. The parameters set to None are not changed.
+        :return: The new config
+        """
+        kwargs = {name: getattr(self, name) for name in self.FIELDS}
+        kwargs["type"] = self.name
+        kwargs.update({k: v for k, v in changes.items() if v is not None})
+        return ProgressConfig(**kwargs)
+
+    def set(self, name: str, value: Any) -> 'ProgressConfig':
+        """
+        Make a copy of the config with one parameter changed. Unlike `replace`, None is a valid value.
+        :param name: The name of the parameter
+        :param value: The new value
+        :return: The new config
+        """
+        kwargs = {field: getattr(self, field) for field in self.FIELDS}
+        kwargs["type"] = self.name
+        kwargs[name] = value
+        return ProgressConfig(**kwargs)
 
 
+def _config_property(field: str, attr: Optional[str] = None) -> property:
+    """
+    A parameter of the progress bar that is read from its config. Setting it derives a new config for this bar only, so
+    the other bars of the same type are not changed.
+    :param field: The name of the parameter in the config
+    :param attr: The attribute of the config that is read, if it is not the parameter itself (Resolved values)
+    """
+    def fset(self: 'progress', value):
+        self.config = self.config.set(field, value)
+        self._refresh_ns = self.config.refresh_ns
+        self._check_ns = self.config.check_ns
+    return property(attrgetter(f"config.{attr or field}"), fset)
+
+
+def _run_chunk(fn: Callable, chunk: list) -> list:
+    """
+    Run a function over a chunk of items in an executor. It is defined at the module level to be picklable.
+    """
+    return [fn(x) for x in chunk]
 
 
 class progress:
@@ -214,6 +548,35 @@ class progress:
     CONFIGS = {
         "default": ProgressConfig()
     }
+    # Many bars can be created (One per inner loop), so the attributes are slots. The __dict__ is only allocated if user
+    # attributes are set on a bar.
+    __slots__ = ("config", "it", "_desc", "_enum", "_ref", "display", "threaded", "output", "group", "weight",
+                 "_make_stats", "_stats", "added_values", "aggregators", "metrics", "_static_cache", "_total",
+                 "smoothing_factor", "_last_log_ns", "_last_log_count", "start_time", "_start_ns", "_prev_step_ns",
+                 "_last_display_ns", "_refresh_ns", "_check_ns", "_miniters", "_next_check", "ema", "_elapsed_offset",
+                 "count", "last_count", "has_initialized", "iter_ended", "_stop_event", "_renderer", "_async",
+                 "_render_task", "counters", "worker_counts", "worker_rates", "_workers_sync_ns", "_frame", "reporter",
+                 "render_stats", "history", "time_phases", "_phase_ns", "_phase_nested_ns", "_index", "__weakref__",
+                 "__dict__")
+
+    # Parameters read from the config. Setting them derives a config for the bar
+    cu = _config_property("cu")
+    cd = _config_property("cd")
+    max_c = _config_property("max_width")
+    delim = _config_property("delim")
+    done_delim = _config_property("done_delim")
+    done_charac = _config_property("done_charac")
+    cursors = _config_property("cursors")
+    refresh_rate = _config_property("refresh_rate")
+    end = _config_property("end")
+    ignore_term_width = _config_property("ignore_term_width")
+    color = _config_property("color")
+    done_color = _config_property("done_color")
+    log_interval = _config_property("log_interval")
+    log_step = _config_property("log_step")
+    pre_cb = _config_property("pre_cb")
+    post_cb = _config_property("post_cb")
+    spinner = _config_property("spinner", "frames")
 
     @classmethod
     def set_config(cls, type: str = "default",
@@ -233,6 +596,13 @@ class progress:
                    color: Optional[BaseColor] = None,
                    done_color: Optional[BaseColor] = None,
                    display: Optional[bool] = None,
+                   threaded: Optional[bool] = None,
+                   output: Optional[Literal["auto", "tty", "text", "json"]] = None,
+                   log_interval: Optional[float] = None,
+                   log_step: Optional[float] = None,
+                   stats: Optional[Callable[[], ProgressStats]] = None,
+                   spinner: Optional[Union[str, Tuple[str, ...]]] = None,
+                   metrics: Optional[MetricsExporter] = None,
                    pre_cb: Optional[Sequence[Callable[['progress'], str]]] = None,
                    post_cb: Optional[Sequence[Callable[['progress'], str]]] = None):
         """
@@ -271,33 +641,58 @@ class progress:
         :param color: The color of the progress bar. By default, the default terminal color is used.
         :param done_color: The color of the progress bar when it is done. By default, the default terminal color is used.
         :param: display: If False, the progress bar won't be displayed to the console.
+        :param threaded: If True, the progress bar is drawn by a daemon thread every `refresh_rate` seconds. The iteration
+        then only increments the count, and the bar keeps being refreshed (elapsed time) even during a slow step.
+        :param output: How the progress is displayed. 'tty' draws the bar on a single line that is redrawn. 'text' and
+        'json' print one compact log line every `log_interval` seconds or every `log_step` of progress, which is better
+        suited for logs (CI, containers, batch jobs). 'auto' uses 'tty' if the standard output is interactive, and 'text'
+        otherwise.
+        :param log_interval: The maximum delay in seconds between two log lines ('text' and 'json' outputs)
+        :param log_step: The progress (fraction of the total) after which a log line is printed ('text' and 'json'
+        outputs)
+        :param stats: The statistics engine: a ProgressStats class, or any callable returning a ProgressStats object. Each
+        progress bar creates its own engine. By default, it is WindowedStats: the rate is computed on a sliding window of
+        10s. With WindowedStats(percentiles=True), it also measures each step to provide the percentiles of the step
+        duration.
+        :param spinner: The frames used to animate the bar when the total is unknown. It can be the name of a frame set
+        of the spinner module (legacy, modern, trig, circle, bounce, wave, moon, globe, clock) or a sequence of frames.
+        :param metrics: A MetricsExporter that publishes the count, total, rate, eta and the numeric values of the bar in
+        the Prometheus text format (Textfile or HTTP). The exporter reads the bar in its own thread, so it does not slow
+        down the iteration.
         :param pre_cb: The ordered list of callback functions that are called before the progress bar. The callback functions
         must take a progress object as parameter and return a string. The strings are concatenated to form the preline.
         :param post_cb: The ordered list of callback functions that are called after the progress bar. The callback functions
         must take a progress object as parameter and return a string. The strings are concatenated to form the postline.
         :return: None
         """
-        def_cfg = deepcopy(cls.CONFIGS["default"])
-        cls.CONFIGS[type] = ProgressConfig(
-            desc=desc if desc is not None else def_cfg.desc,
+        # The other configurations are derived from the default one
+        cls.CONFIGS[type] = cls.CONFIGS["default"].replace(
             type=type,
-            cu=cu if cu is not None else def_cfg.cu,
-            cd=cd if cd is not None else def_cfg.cd,
-            max_width=max_width if max_width is not None else def_cfg.max_width,
-            delim=delim if delim is not None else def_cfg.delim,
-            done_delim=done_delim if done_delim is not None else def_cfg.done_delim,
-            done_charac=done_charac if done_charac is not None else def_cfg.done_charac,
-            cursors=cursors if cursors is not None else def_cfg.cursors,
-            refresh_rate=refresh_rate if refresh_rate is not None else def_cfg.refresh_rate,
-            end=end if end is not None else def_cfg.end,
-            enum=enum if enum is not None else def_cfg.enum,
-            ref=ref if ref is not None else def_cfg.ref,
-            ignore_term_width=ignore_term_width if ignore_term_width is not None else def_cfg.ignore_term_width,
-            pre_cb=pre_cb if pre_cb is not None else def_cfg.pre_cb,
-            post_cb=post_cb if post_cb is not None else def_cfg.post_cb,
-            color=color if color is not None else def_cfg.color,
-            done_color=done_color if done_color is not None else def_cfg.done_color,
-            display=display if display is not None else def_cfg.display
+            desc=desc,
+            cu=cu,
+            cd=cd,
+            max_width=max_width,
+            delim=delim,
+            done_delim=done_delim,
+            done_charac=done_charac,
+            cursors=cursors,
+            refresh_rate=refresh_rate,
+            end=end,
+            enum=enum,
+            ref=ref,
+            ignore_term_width=ignore_term_width,
+            pre_cb=pre_cb,
+            post_cb=post_cb,
+            color=color,
+            done_color=done_color,
+            display=display,
+            threaded=threaded,
+            output=output,
+            log_interval=log_interval,
+            log_step=log_step,
+            stats=stats,
+            spinner=spinner,
+            metrics=metrics
         )
 
     def __init__(self, it: Optional[Iterable] = None, *,
@@ -319,184 +714,1198 @@ class progress:
                  color: Optional[BaseColor] = None,
                  done_color: Optional[BaseColor] = None,
                  display: Optional[bool] = None,
+                 threaded: Optional[bool] = None,
+                 output: Optional[Literal["auto", "tty", "text", "json"]] = None,
+                 log_interval: Optional[float] = None,
+                 log_step: Optional[float] = None,
+                 stats: Optional[Callable[[], ProgressStats]] = None,
+                 spinner: Optional[Union[str, Tuple[str, ...]]] = None,
+                 metrics: Optional[MetricsExporter] = None,
                  pre_cb: Optional[Sequence[Callable[['progress'], str]]] = None,
                  post_cb: Optional[Sequence[Callable[['progress'], str]]] = None,
+                 group: Optional['ProgressGroup'] = None,
+                 workers: Optional[int] = None,
+                 weight: Optional[Callable[[Any], int]] = None,
+                 aggregate: Optional[Dict[str, Union[str, Aggregator]]] = None,
+                 reporter: Optional['ProgressReporter'] = None,
+                 profile: bool = False,
+                 frame_budget: Optional[float] = None,
+                 history: Optional[MetricsHistory] = None,
+                 phases: bool = False,
                 **kwargs):
-        # Get the config
-        if type not in self.CONFIGS:
+        # Get the config. It is shared by all the bars of this type, only the bars with custom parameters get their own
+        config: ProgressConfig = self.CONFIGS.get(type)
+        if config is None:
             raise ValueError(f"Type {type} was not setup, hence doesn't exist.")
-        config: ProgressConfig = self.CONFIGS[type]
-        self.it = iter(it) if it is not None else None
-        self.desc = desc if desc is not None else config.desc
-        self.cu = cu if cu is not None else config.cu
-        self.cd = cd if cd is not None else config.cd
-        self.max_c = max_width if max_width is not None else config.max_width
-        self.delim = delim if delim is not None else config.delim
-        self.done_delim = done_delim if done_delim is not None else config.done_delim
-        self.done_charac = done_charac if done_charac is not None else config.done_charac
-        self.cursors = cursors if cursors is not None else config.cursors
-        self.refresh_rate = refresh_rate if refresh_rate is not None else config.refresh_rate
-        self.end = end if end is not None else config.end
+        if (cu is not None or cd is not None or max_width is not None or delim is not None or done_delim is not None
+                or done_charac is not None or cursors is not None or refresh_rate is not None or end is not None
+                or ignore_term_width is not None or color is not None or done_color is not None
+                or log_interval is not None or log_step is not None or spinner is not None or pre_cb is not None
+                or post_cb is not None):
+            config = config.replace(cu=cu, cd=cd, max_width=max_width, delim=delim, done_delim=done_delim,
+                                    done_charac=done_charac, cursors=cursors, refresh_rate=refresh_rate, end=end,
+                                    ignore_term_width=ignore_term_width, color=color, done_color=done_color,
+                                    log_interval=log_interval, log_step=log_step, spinner=spinner, pre_cb=pre_cb,
+                                    post_cb=post_cb)
+        if phases and format_phases not in config.post_cb:
+            # Display the phases before the reported values
+            post_cb = config.post_cb
+            i = post_cb.index(format_sep) if format_sep in post_cb else len(post_cb)
+            config = config.replace(post_cb=post_cb[:i] + (format_phases,) + post_cb[i:])
+        self.config = config
+        self._frame: Optional[FrameContext] = None
+        self._static_cache: Dict[Callable[['progress'], str], Tuple[str, str]] = {}
+        self._desc = desc if desc is not None else config.desc
         self._enum = enum if enum is not None else config.enum
         self._ref = ref if ref is not None else config.ref
-        self.ignore_term_width = ignore_term_width if ignore_term_width is not None else config.ignore_term_width
-        self.color = color if color is not None else config.color
-        self.done_color = done_color if done_color is not None else config.done_color
         self.display = display if display is not None else config.display
+        self.threaded = threaded if threaded is not None else config.threaded
+        self.group = group
+        output = output if output is not None else config.output
+        if output == "auto":
+            output = "tty" if _is_interactive() else "text"
+        elif output not in ("tty", "text", "json"):
+            raise ValueError(f"Unknown output: {output}")
+        self.output = output
+        # With a weight, the count is in weighted units (Ex: samples), not in items
+        self.weight = weight
+        # Measure the time spent fetching the items and in the loop body
+        self.time_phases = phases
+        self._make_stats = stats if stats is not None else config.stats
+        self.added_values = kwargs
+        # Aggregated reported values. They are folded in added_values when a frame is rendered
+        self.aggregators: Dict[str, Aggregator] = {k: make_aggregator(v) for k, v in aggregate.items()} if aggregate else {}
 
-        if total is None:
+        # Background renderer (threaded mode, or a task of the event loop with async iteration)
+        self._stop_event: Optional[threading.Event] = None
+        self._renderer: Optional[threading.Thread] = None
+
+        # Count, timing and statistics
+        self._reset_state(it, total)
+
+        self.metrics = metrics if metrics is not None else config.metrics
+        if self.metrics is not None:
+            self.metrics.register(self)
+        # Sends the progress to a collector (Multiple processes or nodes)
+        self.reporter = reporter
+
+        # Cost of the widgets and frames (Opt-in)
+        self.render_stats: Optional[RenderStats] = None
+        if profile or frame_budget is not None:
+            self.render_stats = RenderStats(frame_budget)
+        # Reported values recorded over time (Opt-in)
+        self.history = history
+
+        # Multiprocessing: the workers count in shared memory and the renderer thread sums their counts. The renderer is
+        # started last, since it reads all the other attributes.
+        self.counters: Optional[SharedCounters] = None
+        self.worker_counts: List[int] = []
+        self.worker_rates: List[float] = []
+        if workers is not None:
+            self.counters = SharedCounters(workers)
+            self.threaded = True
+            self._workers_sync_ns = time.perf_counter_ns()
+            self.prep_step_duration()
+            self._start_renderer()
+
+    def _reset_state(self, it: Optional[Iterable], total: Optional[int]):
+        """
+        Set the iterable and (re)initialize the count, the timing and the statistics.
+        """
+        if it is None:
+            self.it = None
+        elif hasattr(it, "__aiter__"):
+            if self.time_phases:
+                raise ValueError("The phases can't be measured for async iterables: the fetch of an item is awaited, "
+                                 "so it overlaps with the other tasks of the event loop.")
+            self.it = it.__aiter__()
+        elif self.time_phases:
+            self.it = self._iter_timed(iter(it))
+        else:
+            self.it = iter(it)
+        if total is None and self.weight is None:
             try:
                 self.total = len(it)
             except TypeError:
                 self.total = None
         else:
             self.total = total
+        self._last_log_ns: Optional[int] = None
+        self._last_log_count = 0
 
-        # For timing
+        # For timing. The hot path only reads the monotonic clock every `_miniters` items (See `_tick`)
         self.start_time: Optional[datetime] = None
-        self.prev_step: Optional[datetime] = None
-        self.last_display: Optional[datetime] = None
+        self._start_ns = 0
+        self._prev_step_ns = 0
+        self._last_display_ns = 0
+        self._refresh_ns = self.config.refresh_ns
+        self._check_ns = self.config.check_ns
+        self._miniters = 1
+        self._next_check = 1
         self.ema = 0
-        self.smoothing_factor = 2/(1 + self.total) if self.total is not None else 2/(1+100)
-
-        # Callbacks
-        self.pre_cb = pre_cb if pre_cb is not None else config.pre_cb
-        self.post_cb = post_cb if post_cb is not None else config.post_cb
+        # Elapsed time of the previous runs, when the state was restored (See `load_state`)
+        self._elapsed_offset = 0.
+        # The statistics engine and the phase times are created when first used (See `stats` and `phase_ns`)
+        self._stats: Optional[ProgressStats] = None
+        self._phase_ns: Optional[Dict[str, int]] = None
+        self._phase_nested_ns = 0
 
-        self.added_values = kwargs
         self.count = 0
-        self.last_count: Optional[int] = None
+        # Number of items consumed, the enum index when the items are weighted
+        self._index = 0
+        self.last_count: int = 0
         self.has_initialized = False
         self.iter_ended = False
+        self._async = False
+        self._render_task: Optional[asyncio.Task] = None
 
-    def __iter__(self):
+    def reset(self, it: Optional[Iterable] = None, total: Optional[int] = None) -> 'progress':
+        """
+        Reuse the progress bar for a new iteration, instead of creating a new bar (Ex: an inner loop). The configuration,
+        the description and the reported values are kept, while the count, the timing, the statistics and the aggregates
+        are reset. Example:
+        ```
+        bar = progress(desc="batch")
+        for epoch in range(100):
+            for batch in bar.reset(loader):
+                ...
+        ```
+        :param it: The new iterable
+        :param total: The new total. If None, the length of the iterable is used (If it has one).
+        :return: The progress bar
+        """
+        if self.counters is not None:
+            raise RuntimeError("A progress bar that counts the work of multiple processes (workers) can't be reset.")
+        self._stop_renderer()
+        self._reset_state(it, total)
+        for k, agg in self.aggregators.items():
+            agg.reset()
+            # The aggregate of the previous iteration is not displayed
+            self.added_values.pop(k, None)
+        if self.render_stats is not None:
+            self.render_stats = RenderStats(self.render_stats.budget)
+        if self.metrics is not None:
+            self.metrics.register(self)
         return self
 
+    def __iter__(self):
+        """
+        Iterating is done through a generator instead of the __next__ method because resuming a generator is a lot
+        cheaper than calling a python method at each step. A bar that is not displayed still reads the clock every few
+        steps, so its rate, eta and statistics can be read.
+        """
+        if self.weight is not None:
+            return self._iter_weighted()
+        return self._iter_display()
+
     def __next__(self):
         try:
             # Loading next element
             ne = next(self.it)
-            self.last_count = self.count
+        except StopIteration:
+            self._finish()
+            raise StopIteration
+        if self.weight is not None:
+            self.count += self.weight(ne)
+            self._index += 1
+        else:
             self.count += 1
+        if self.count >= self._next_check:
+            self._tick()
+        return self.return_fn(ne)
+
+    def _iter_display(self):
+        enum, ref = self._enum, self._ref
+        count = self.count
+        try:
+            for ne in self.it:
+                count += 1
+                self.count = count
+                # Not cached in a local: the monitor can lower it when the items slow down
+                if count >= self._next_check:
+                    self._tick()
+                # Inlined version of return_fn
+                if not enum and not ref:
+                    yield ne
+                elif not enum:
+                    yield self, ne
+                elif not ref:
+                    yield count - 1, ne
+                else:
+                    yield count - 1, self, ne
+        finally:
+            # The loop can be exited early with a break
+            self._stop_renderer()
+        self._finish()
+
+    def _iter_weighted(self):
+        # Same as _iter_display, but each item counts for its weight. The enum index is the index of the item.
+        enum, ref = self._enum, self._ref
+        weight = self.weight
+        count = self.count
+        index = 0
+        try:
+            for ne in self.it:
+                count += weight(ne)
+                self.count = count
+                if count >= self._next_check:
+                    self._tick()
+                if not enum and not ref:
+                    yield ne
+                elif not enum:
+                    yield self, ne
+                elif not ref:
+                    yield index, ne
+                else:
+                    yield index, self, ne
+                index += 1
+        finally:
+            self._stop_renderer()
+        self._finish()
+
+    @property
+    def stats(self) -> ProgressStats:
+        """
+        The statistics engine of the step durations (See the `stats` parameter). It is created at the first step, so
+        bars that are never iterated don't allocate it.
+        """
+        if self._stats is None:
+            self._stats = self._make_stats()
+        return self._stats
+
+    @property
+    def phase_ns(self) -> Dict[str, int]:
+        """
+        The time spent in each phase of the steps, in nanoseconds (See `phase`)
+        """
+        if self._phase_ns is None:
+            self._phase_ns = {}
+        return self._phase_ns
+
+    def _iter_timed(self, it: Iterator):
+        """
+        Wrap the iterator to measure the time spent fetching each item (data) and in the loop body (compute). The time
+        spent in custom phases is not counted in the loop body.
+        """
+        phase_ns = self.phase_ns
+        phase_ns["data"] = phase_ns["compute"] = 0
+        clock = time.perf_counter_ns
+        start = clock()
+        for ne in it:
+            fetched = clock()
+            phase_ns["data"] += fetched - start
+            # Only the custom phases of this loop body are subtracted
+            nested = self._phase_nested_ns
+            yield ne
+            start = clock()
+            phase_ns["compute"] += max(start - fetched - (self._phase_nested_ns - nested), 0)
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        Measure the time spent in a section of the loop body. Its share of the step time is displayed by the
+        `format_phases` widget (Added with the `phases` option), and it is not counted in the `compute` phase. Phases
+        must not be nested. Example:
+        ```
+        bar = progress(loader, type="dl", phases=True)
+        for batch in bar:
+            with bar.phase("augment"):
+                batch = augment(batch)
+            train_step(batch)
+        ```
+        :param name: The name of the phase
+        """
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter_ns() - start
+            self.phase_ns[name] = self.phase_ns.get(name, 0) + duration
+            self._phase_nested_ns += duration
+
+    @property
+    def phase_times(self) -> Dict[str, float]:
+        """
+        The time spent in each phase of the steps, in seconds: `data` (Fetching the items), the custom phases (See
+        `phase`), and `compute` (The rest of the loop body). The data and compute phases are only measured with the
+        `phases` option.
+        """
+        phase_ns = dict(self._phase_ns or {})
+        compute = phase_ns.pop("compute", None)
+        if compute is not None:
+            phase_ns["compute"] = compute
+        return {name: ns / 1e9 for name, ns in phase_ns.items()}
+
+    @property
+    def phase_shares(self) -> Dict[str, float]:
+        """
+        The share of the time spent in each phase of the steps, between 0 and 1 (See `phase_times`). Empty if nothing
+        was measured yet.
+        """
+        times = self.phase_times
+        total = sum(times.values())
+        if total <= 0:
+            return {}
+        return {name: t / total for name, t in times.items()}
+
+    def __aiter__(self):
+        """
+        Asynchronous iteration over an AsyncIterable. The iteration only counts, the bar is drawn by a task of the event
+        loop at the refresh rate.
+        """
+        self._async = True
+        return self._aiter()
+
+    async def _aiter(self):
+        enum, ref = self._enum, self._ref
+        try:
+            async for ne in self.it:
+                if self.weight is not None:
+                    self.count += self.weight(ne)
+                    self._index += 1
+                else:
+                    self.count += 1
+                if self.count >= self._next_check:
+                    self._tick()
+                if not enum and not ref:
+                    yield ne
+                else:
+                    yield self.return_fn(ne)
+        finally:
+            self._stop_renderer()
+        self._finish()
+
+    @classmethod
+    async def as_completed(cls, aws: Iterable[Awaitable], *, timeout: Optional[float] = None, **kwargs):
+        """
+        Like asyncio.as_completed, but with a progress bar. It yields the results of the awaitables as they finish.
+        Example:
+        ```
+        async for response in progress.as_completed([fetch(url) for url in urls], type="pip"):
+            ...
+        ```
+        :param aws: The awaitables
+        :param timeout: Raise asyncio.TimeoutError if all the awaitables are not done before the timeout
+        :param kwargs: The parameters of the progress bar
+        :return: An async generator of the results
+        """
+        aws = list(aws)
+
+        async def results():
+            for fut in asyncio.as_completed(aws, timeout=timeout):
+                yield await fut
+
+        async for x in cls(results(), total=len(aws), **kwargs):
+            yield x
+
+    @classmethod
+    async def gather(cls, *aws: Awaitable, return_exceptions: bool = False, **kwargs) -> list:
+        """
+        Like asyncio.gather, but with a progress bar that advances each time an awaitable finishes.
+        Example:
+        ```
+        responses = await progress.gather(*[fetch(url) for url in urls], desc="Fetching")
+        ```
+        :param aws: The awaitables
+        :param return_exceptions: If True, the exceptions are returned as results instead of being raised
+        :param kwargs: The parameters of the progress bar
+        :return: The results, in the order of the awaitables
+        """
+        futures = [asyncio.ensure_future(aw) for aw in aws]
+
+        async def wait_each():
+            for fut in asyncio.as_completed(futures):
+                try:
+                    yield await fut
+                except Exception:
+                    if not return_exceptions:
+                        raise
+                    yield None
+
+        async for _ in cls(wait_each(), total=len(futures), **kwargs):
+            pass
+        return await asyncio.gather(*futures, return_exceptions=return_exceptions)
+
+    @classmethod
+    def map(cls, fn: Callable[[Any], Any], iterable: Iterable, *,
+            executor: Optional[Executor] = None,
+            chunksize: int = 1,
+            ordered: bool = True,
+            max_pending: Optional[int] = None,
+            total: Optional[int] = None,
+            **kwargs) -> Iterator:
+        """
+        Map a function over an iterable in an executor, with a progress bar. The items are submitted in chunks to reduce
+        the overhead (Inter-process communication with a ProcessPoolExecutor), and the number of chunks that are
+        submitted at the same time is bounded, so the iterable is consumed lazily. The results are also returned lazily.
+        Example:
+        ```
+        with ProcessPoolExecutor() as ex:
+            for result in progress.map(work, items, executor=ex, chunksize=64, type="pip"):
+                ...
+        ```
+        :param fn: The function to map. It must be picklable if a ProcessPoolExecutor is used.
+        :param iterable: The items
+        :param executor: The executor. If None, a ThreadPoolExecutor is created, and shut down at the end.
+        :param chunksize: The number of items per submitted task
+        :param ordered: If True, the results are returned in the order of the items. Otherwise, they are returned as
+        soon as their chunk is done.
+        :param max_pending: The maximum number of chunks submitted at the same time. By default, twice the number of
+        workers of the executor.
+        :param total: The number of items, if the iterable doesn't have a length.
+        :param kwargs: The parameters of the progress bar
+        :return: An iterator over the results
+        """
+        if chunksize < 1:
+            raise ValueError(f"chunksize must be at least 1, got {chunksize}")
+        if total is None:
+            try:
+                total = len(iterable)
+            except TypeError:
+                pass
+        bar = cls(total=total, **kwargs)
+        return bar._map(fn, iterable, executor, chunksize, ordered, max_pending)
+
+    def _map(self, fn, iterable, executor: Optional[Executor], chunksize: int, ordered: bool,
+             max_pending: Optional[int]):
+        # The executor is created when the iteration starts, so it doesn't leak if the results are never iterated
+        own_executor = executor is None
+        if own_executor:
+            executor = ThreadPoolExecutor()
+        if max_pending is None:
+            max_pending = 2 * getattr(executor, "_max_workers", os.cpu_count() or 1)
+        it = iter(iterable)
+        pending: Union[Deque[Future], Set[Future]] = deque() if ordered else set()
+
+        def submit() -> bool:
+            chunk = list(islice(it, chunksize))
+            if len(chunk) == 0:
+                return False
+            fut = executor.submit(_run_chunk, fn, chunk)
+            if ordered:
+                pending.append(fut)
+            else:
+                pending.add(fut)
+            return True
+
+        try:
+            exhausted = False
+            while True:
+                while not exhausted and len(pending) < max_pending:
+                    exhausted = not submit()
+                if len(pending) == 0:
+                    break
+                if ordered:
+                    done = [pending.popleft()]
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    pending.difference_update(done)
+                for fut in done:
+                    results = fut.result()
+                    self.advance(len(results))
+                    yield from results
+        finally:
+            for fut in pending:
+                fut.cancel()
+            if own_executor:
+                executor.shutdown(wait=False)
+        if not self.iter_ended:
+            self._finish()
+
+    @classmethod
+    def chunks(cls, obj: Any, chunk_size: int, total: Optional[int] = None, **kwargs) -> 'progress':
+        """
+        Iterate over an array or a buffer by chunks of `chunk_size` elements, with a progress bar that counts the
+        elements. The chunks are views, not copies, and are created lazily, so the memory stays flat whatever the size
+        of the object. Example:
+        ```
+        for chunk in progress.chunks(samples, 1 << 16, desc="Normalizing"):
+            chunk -= chunk.mean()
+        ```
+        - Arrays (Objects with a `shape`, like NumPy arrays or torch tensors) are sliced along their first axis, so the
+        chunks are views of the same type.
+        - Objects with the buffer protocol (bytes, bytearray, array.array, mmap, ...) are sliced through a memoryview.
+        - Other sequences (`__getitem__` and `__len__`) are sliced. Only the chunk is copied if slicing copies (lists).
+        :param obj: The array, buffer or sequence
+        :param chunk_size: The number of elements per chunk (Rows for multidimensional arrays)
+        :param total: The number of elements. By default, the length of the object.
+        :param kwargs: The parameters of the progress bar
+        :return: The progress bar, to iterate over the chunks
+        """
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+        if not hasattr(obj, "shape"):
+            try:
+                obj = memoryview(obj)
+            except TypeError:
+                if not (hasattr(obj, "__getitem__") and hasattr(obj, "__len__")):
+                    raise TypeError(f"Expected an object with the buffer protocol or a sequence, got "
+                                    f"{type(obj).__name__}") from None
+        n = len(obj)
+        return cls(_iter_chunks(obj, n, chunk_size), total=total if total is not None else n, weight=len, **kwargs)
+
+    @classmethod
+    def wrap_file(cls, file: IO, total: Optional[int] = None, **kwargs) -> 'ProgressFile':
+        """
+        Wrap a file object (or any stream) to track the bytes that are read or written. The progress bar uses the
+        `bytes` type by default, which displays scaled units (kB, MB, GB) and the throughput.
+        Example:
+        ```
+        with progress.wrap_file(open("data.bin", "rb"), desc="Hashing") as f:
+            for chunk in f.chunks(1 << 20):
+                h.update(chunk)
+        ```
+        :param file: The binary file object. Text files are rejected: they count characters, not bytes.
+        :param total: The number of bytes. If None and the file is readable, the remaining size of the file is used.
+        :param kwargs: The parameters of the progress bar
+        :return: The wrapped file
+        """
+        if isinstance(file, io.TextIOBase):
+            raise TypeError("The file is opened in text mode, so its characters would be counted as bytes. Open it in "
+                            "binary mode, or wrap its binary buffer (file.buffer).")
+        if total is None:
+            try:
+                if file.readable():
+                    total = os.fstat(file.fileno()).st_size - file.tell()
+            except (AttributeError, OSError, ValueError):
+                pass
+        kwargs.setdefault("type", "bytes")
+        kwargs.setdefault("unit", "B")
+        return ProgressFile(file, cls(total=total, **kwargs))
+
+    def advance(self, n: int = 1):
+        """
+        Increment the count by n. Unlike `update`, the position does not need to be known, and it costs the same as an
+        iteration step: the clock is only read every few calls, so it can be called for each batch. Example:
+        ```
+        bar = progress(total=n_samples)
+        for batch in loader:
+            ...
+            bar.advance(len(batch))
+        bar.close()
+        ```
+        The done bar is displayed when the count reaches the total, in every mode (threaded and async included).
+        :param n: The increment
+        :return: None
+        """
+        self.count += n
+        if self.count >= self._next_check:
+            self._tick()
+        elif self._renderer is None and self._render_task is None:
+            # Without a renderer, the gate stops at the total (See `_tick`)
+            return
+        if self.total is not None and self.count >= self.total and not self.iter_ended:
+            self._finish()
+
+    def _tick(self) -> int:
+        """
+        Slow path of the iteration. It is called every `_miniters` items, reads the clock, updates the step duration
+        and display the bar if the refresh rate allows it. The number of items between two clock reads is adapted to the
+        observed item rate (Like tqdm's miniters) so the clock is read about four times per refresh period.
+        :return: The count at which the next clock read must happen
+        """
+        now = time.perf_counter_ns()
+        if self.has_initialized:
+            dt = now - self._prev_step_ns
+            if dt > 0 and not self.stats.per_step:
+                # Never more than double the gate at once, so a burst of fast items cannot freeze the bar
+                self._miniters = max(1, min((self.count - self.last_count) * self._check_ns // dt, 2 * self._miniters))
+        self.prep_step_duration(now)
+        if self.reporter is not None:
+            self.reporter.maybe_send(self, now)
+
+        if (self.threaded or self._async) and self.display:
+            # From now on, the renderer reads the clock and draws the bar
+            self._start_renderer()
+            self._next_check = sys.maxsize
+            return self._next_check
 
-            # Measure the duration of each steps
+        if self.display and now - self._last_display_ns >= self._refresh_ns:
+            self.display_loading_bar()
+        self._next_check = self.count + self._miniters
+        if self._miniters > 1:
+            # The gate is only based on the count: if the items slow down, the monitor reopens it
+            _MONITOR.add(self)
+        # Do not skip the end, so `advance` can detect it
+        if self.total is not None and self.count < self.total < self._next_check:
+            self._next_check = self.total
+        return self._next_check
+
+    def _finish(self):
+        self._stop_renderer()
+        self.iter_ended = True
+        # Account for the items that were consumed since the last clock read
+        if self.has_initialized and self.count > self.last_count:
             self.prep_step_duration()
+        if self.aggregators:
+            self.aggregates()
+        # Display done bar
+        if self.display:
+            self.display_done_bar()
+        if self.metrics is not None:
+            self.metrics.finish(self)
+        if self.reporter is not None:
+            self.reporter.send(self, done=True)
+        if self.history is not None:
+            self.history.finish(self)
 
-            # Early return because we do not want to display the progress bar yet (If true)
-            if (datetime.now() - self.last_display).total_seconds() < self.refresh_rate:
-                return self.return_fn(ne)
+    def _start_renderer(self):
+        if self._async:
+            if self._render_task is None:
+                self._render_task = asyncio.get_running_loop().create_task(self._async_render_loop())
+            return
+        if self._renderer is not None:
+            return
+        self._stop_event = threading.Event()
+        self._renderer = threading.Thread(target=self._render_loop, args=(self._stop_event,), daemon=True)
+        self._renderer.start()
+
+    def _stop_renderer(self):
+        if self._render_task is not None:
+            # The event loop is single threaded, so the task can't be drawing right now
+            self._render_task.cancel()
+            self._render_task = None
+        if self._renderer is None:
+            return
+        self._stop_event.set()
+        self._renderer.join()
+        self._renderer = None
 
-            # Display progress bar
+    def _render_loop(self, stop_event: threading.Event):
+        """
+        Target of the renderer thread in threaded mode. It is the only one updating the step duration while it runs,
+        so the iterating thread only has to increment the count.
+        """
+        while True:
+            if self.counters is not None:
+                self._sync_workers()
+            self.prep_step_duration()
+            if self.reporter is not None:
+                self.reporter.maybe_send(self, self._prev_step_ns)
+            if self.counters is not None and self.total is not None and self.count >= self.total:
+                # All the workers are done
+                self.iter_ended = True
+                if self.display:
+                    self.display_done_bar()
+                return
             if self.display:
                 self.display_loading_bar()
-            return self.return_fn(ne)
+            if stop_event.wait(self.refresh_rate):
+                break
 
-        except StopIteration:
-            self.iter_ended = True
-            # Display done bar
-            if self.display:
-                self.display_done_bar()
-            raise StopIteration
+    async def _async_render_loop(self):
+        """
+        Asynchronous version of the renderer. It runs as a task of the event loop.
+        """
+        while True:
+            self.prep_step_duration()
+            if self.reporter is not None:
+                self.reporter.maybe_send(self, self._prev_step_ns)
+            self.display_loading_bar()
+            await asyncio.sleep(self.refresh_rate)
+
+    def _sync_workers(self):
+        """
+        Read the counters of the workers, and update the count and the speed of each worker.
+        """
+        now = time.perf_counter_ns()
+        counts = self.counters.counts()
+        dt = (now - self._workers_sync_ns) / 1e9
+        if dt > 0:
+            rates = []
+            for i, count in enumerate(counts):
+                prev = self.worker_counts[i] if i < len(self.worker_counts) else 0
+                rate = (count - prev) / dt
+                if i < len(self.worker_rates):
+                    rate = 0.3 * rate + 0.7 * self.worker_rates[i]
+                rates.append(rate)
+            self.worker_rates = rates
+            self._workers_sync_ns = now
+        self.worker_counts = counts
+        self.count = sum(counts)
+
+    def close(self):
+        """
+        Stop the renderer thread, if any. It is done automatically when the iteration ends, or when the loop is exited
+        with a break. Call it only if you used `next()` or `update()` and stopped before the end.
+
+        If the bar counts the work of multiple processes (`workers`), it also displays the done bar and releases the
+        shared memory. It must always be called in that case, or the bar can be used as a context manager.
+        :return: The final aggregates of the reported values (See `aggregates`)
+        """
+        self._release(finish=True)
+        return self.aggregates()
+
+    def _release(self, finish: bool):
+        self._stop_renderer()
+        if self.counters is not None:
+            if finish and not self.iter_ended:
+                self._sync_workers()
+                self._finish()
+            self.counters.close()
+        if self.metrics is not None and not self.iter_ended:
+            # Publish the last state of a bar that was interrupted
+            self.metrics.finish(self)
+
+    def state_dict(self) -> Dict[str, Any]:
+        """
+        The state of the progress bar: the count, the total, the elapsed time, the step duration estimators and the
+        reported values. Only the values that are JSON serializable are kept (NumPy scalars are converted). The
+        recorded history, if any, is included.
+        :return: A JSON serializable dict
+        """
+        if self.aggregators:
+            self.aggregates()
+        values = {}
+        for k, v in self.added_values.items():
+            if hasattr(v, "item") and getattr(v, "ndim", 1) == 0:
+                v = v.item()
+            if v is None or isinstance(v, (bool, int, float, str)):
+                values[k] = v
+        state = dict(
+            version=1,
+            count=self.count,
+            total=self.total,
+            elapsed=self.elapsed,
+            ema=self.ema,
+            stats=self.stats.state_dict(),
+            added_values=values
+        )
+        if self.history is not None:
+            state["history"] = self.history.state_dict()
+        return state
+
+    def load_state_dict(self, state: Dict[str, Any]):
+        """
+        Restore a state given by `state_dict`. It must be called before the iteration starts. The count continues from
+        the saved count, so the iterable must only yield the remaining items. The saved total replaces the total of the
+        bar, and the saved step duration gives a correct eta from the first step.
+        :param state: The state
+        :return: None
+        """
+        if self.has_initialized:
+            raise RuntimeError("The state must be restored before the progress bar starts.")
+        self.count = self.last_count = state["count"]
+        self._next_check = self.count + 1
+        if state.get("total") is not None:
+            self.total = state["total"]
+        self._elapsed_offset = state.get("elapsed", 0.)
+        self.ema = state.get("ema", 0)
+        self.stats.load_state_dict(state.get("stats", {}))
+        self.added_values.update(state.get("added_values", {}))
+        if self.history is not None and "history" in state:
+            self.history.load_state_dict(state["history"])
+
+    def save_state(self, path: str):
+        """
+        Save the state of the progress bar in a small JSON file, for example alongside a checkpoint. The file is
+        rewritten atomically, so a job interrupted while saving keeps the previous state.
+        :param path: The path of the file
+        :return: None
+        """
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state_dict(), f)
+        os.replace(tmp, path)
+
+    def load_state(self, path: str, missing_ok: bool = True) -> 'progress':
+        """
+        Restore the state saved with `save_state`. Example:
+        ```
+        bar = progress(range(start_step, n_steps), desc="train").load_state("ckpt/progress.json")
+        for step in bar:
+            ...
+            if step % 1000 == 0:
+                save_checkpoint(...)
+                bar.save_state("ckpt/progress.json")
+        ```
+        :param path: The path of the file
+        :param missing_ok: If True and the file does not exist (First run), nothing is restored. Otherwise, raise a
+        FileNotFoundError.
+        :return: The progress bar
+        """
+        if not os.path.exists(path) and missing_ok:
+            return self
+        with open(path, "r") as f:
+            self.load_state_dict(json.load(f))
+        return self
+
+    def __enter__(self) -> 'progress':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        # Do not display the done bar if the work failed
+        self._release(finish=exc_type is None)
+        return False
+
+    @property
+    def desc(self) -> Optional[str]:
+        return self._desc
+
+    @desc.setter
+    def desc(self, desc: Optional[str]):
+        self._desc = desc
+        # The static widgets (format_desc) must be rendered again
+        self._static_cache.clear()
+
+    @property
+    def total(self) -> Optional[int]:
+        """
+        The total number of steps. If None, the bar is indeterminate: it displays the count, the elapsed time and the
+        rate, with an animated bar. It can be set at any time, the bar then becomes determinate.
+        """
+        return self._total
+
+    @total.setter
+    def total(self, total: Optional[int]):
+        self._total = total
+        self.smoothing_factor = 2/(1 + total) if total is not None else 2/(1+100)
+
+    @property
+    def rate(self) -> float:
+        """
+        The number of steps per second given by the statistics engine (sliding window by default). Before the engine
+        has enough data, the EMA of the step duration is used. 0 if unknown.
+        """
+        if self._frame is not None:
+            return self._frame.rate
+        rate = self.stats.rate
+        if rate is not None and rate > 0:
+            return rate
+        return 1 / self.ema if self.ema != 0 else 0.
+
+    @property
+    def time_per_step(self) -> float:
+        """
+        The duration of a step in seconds (Inverse of the rate). 0 if unknown.
+        """
+        if self._frame is not None:
+            return self._frame.time_per_step
+        rate = self.rate
+        return 1 / rate if rate != 0 else 0.
+
+    @property
+    def eta(self) -> Optional[float]:
+        """
+        The estimated remaining time in seconds. None if the total or the rate is unknown.
+        """
+        if self._frame is not None:
+            return self._frame.eta
+        rate = self.rate
+        if self.total is None or rate == 0:
+            return None
+        return (self.total - self.count) / rate
+
+    @property
+    def elapsed(self) -> float:
+        """
+        The elapsed time since the first step in seconds
+        """
+        if self._frame is not None:
+            return self._frame.elapsed
+        if not self.has_initialized:
+            return self._elapsed_offset
+        return (time.perf_counter_ns() - self._start_ns) / 1e9 + self._elapsed_offset
+
+    @property
+    def frame(self) -> FrameContext:
+        """
+        The values shared by the widgets of the current frame (elapsed time, rate, eta, fraction done, terminal width).
+        Outside a frame, they are computed on demand.
+        """
+        return self._frame if self._frame is not None else self.make_frame()
 
-    def prep_step_duration(self):
-        # Mean step duration (EMA)
+    def make_frame(self) -> FrameContext:
+        """
+        Compute the values shared by the widgets of a frame. The clock is read once.
+        :return: The frame context
+        """
+        now = time.perf_counter_ns()
+        count = self.count
+        total = self.total
+        if self.has_initialized:
+            elapsed = (now - self._start_ns) / 1e9 + self._elapsed_offset
+        else:
+            elapsed = self._elapsed_offset
+        rate = self.stats.rate
+        if rate is None or rate <= 0:
+            rate = 1 / self.ema if self.ema != 0 else 0.
+        eta = (total - count) / rate if total is not None and rate != 0 else None
+        fraction = count / total if total else None
+        return FrameContext(now, count, elapsed, rate, eta, fraction, self.get_term_width())
+
+    def prep_step_duration(self, now: Optional[int] = None):
+        """
+        Update the mean step duration (EMA) with the steps done since the last call.
+        :param now: The current time given by time.perf_counter_ns. If None, the clock is read.
+        """
+        if now is None:
+            now = time.perf_counter_ns()
+        # Read once, the count may be incremented by another thread in threaded mode
+        count = self.count
         if not self.has_initialized:  # First step: INIT
-            self.start_time = datetime.now()
-            self.prev_step = datetime.now()
+            self.start_time = datetime.now() - timedelta(seconds=self._elapsed_offset)
+            self._start_ns = now
             # Epoch
-            self.last_display = datetime.now() - timedelta(seconds=self.refresh_rate + 1)
+            self._last_display_ns = now - self._refresh_ns - 1
             self.has_initialized = True
+            self.stats.start(now, count)
         else:
             # Get step duration
-            elapsed_steps = self.count - self.last_count
-            step_duration = (datetime.now() - self.prev_step).total_seconds() / elapsed_steps
-            if self.ema == 0:  # Second step: INIT EMA
-                self.ema = step_duration
-            else:
-                self.ema = self.smoothing_factor * step_duration + (1 - self.smoothing_factor) * self.ema
-            self.prev_step = datetime.now()
+            elapsed_steps = count - self.last_count
+            if elapsed_steps == 0:
+                # Nothing happened: keep the previous step as reference
+                return
+            if elapsed_steps > 0:
+                step_duration = (now - self._prev_step_ns) / elapsed_steps / 1e9
+                if self.ema == 0:  # Second step: INIT EMA
+                    self.ema = step_duration
+                else:
+                    # Equivalent to applying the smoothing factor once per elapsed step
+                    alpha = 1 - (1 - self.smoothing_factor) ** elapsed_steps
+                    self.ema = alpha * step_duration + (1 - alpha) * self.ema
+                self.stats.update(now, count, elapsed_steps, step_duration)
+        self._prev_step_ns = now
+        self.last_count = count
 
     @staticmethod
     def esc_len(s: str) -> int:
         """
         Compute the length of only visible characters of a string (Ignore the color escape characters)
         """
-        exp = r'\x1b\[.*?m'
-        raw = re.sub(exp, '', s).rstrip()
-        return len(raw)
+        return len(_ESC_RE.sub('', s).rstrip())
 
-    def display_loading_bar(self):
-        preline = self.make_preline()
-        postline = self.make_postline()
-        line_width = self.get_term_width() - self.esc_len(preline) - self.esc_len(postline) - 5
+    def make_loading_line(self) -> str:
+        """
+        Build the line of the progress bar while loading, widgets included.
+        :return: The line, without the carriage return and the clear line escape sequences
+        """
+        if self.aggregators:
+            self.aggregates()
+        self._frame = frame = self.make_frame()
+        try:
+            line = self._make_loading_line()
+        finally:
+            self._frame = None
+        if self.render_stats is not None:
+            self._record_frame(frame)
+        return line
+
+    def _make_loading_line(self) -> str:
+        preline, pre_width = self._render_widgets(self.pre_cb)
+        postline, post_width = self._render_widgets(self.post_cb, self._post_prefix())
+        line_width = self._frame.term_width - pre_width - post_width - 5
         if line_width < 0:
             line_width = 0
         if line_width > self.max_c:
             line_width = self.max_c
 
-        cursor_pos = int(((self.count) / self.total) * line_width)
-        cursor_progress = (self.count / self.total) * line_width - cursor_pos
-        cursor = self.cursors[math.floor(cursor_progress * len(self.cursors))]
-        if self.count == self.total:
-            cursor = ""
+        frame = self._frame
+        if frame.fraction is None:
+            line = f"{self.delim[0]}{self.make_indeterminate_bar(line_width)}{self.delim[1]}  {_RESET}"
+        else:
+            cursor_pos = int(frame.fraction * line_width)
+            cursor_progress = frame.fraction * line_width - cursor_pos
+            cursor = self.cursors[math.floor(cursor_progress * len(self.cursors))]
+            if frame.count == self.total:
+                cursor = ""
 
-        self.last_display = datetime.now()
-        line = f"{self.delim[0]}{self.cu * cursor_pos}{cursor}{self.cd * (line_width - cursor_pos - 1)}{self.delim[1]}  {ResetColor()}"
+            line = f"{self.delim[0]}{self.cu * cursor_pos}{cursor}{self.cd * (line_width - cursor_pos - 1)}{self.delim[1]}  {_RESET}"
         if self.color is not None:
-            # Clear console
-            print(f"\r\033[K", end="")
-            # Display the line
-            print(f"\r{self.color}" + preline + line + f"{self.color}" + postline, end=f"{ResetColor()}")
+            color = str(self.color)
+            return color + preline + line + color + postline + _RESET
         else:
-            # Clear console
-            print(f"\r\033[K", end="")
-            # Display the line
-            print("\r" + preline + line + postline, end="")
+            return preline + line + postline
 
-    def display_done_bar(self):
-        preline = self.make_preline()
-        postline = self.make_postline()
-        line_width = self.get_term_width() - self.esc_len(preline) - self.esc_len(postline) - 5
+    def _record_frame(self, frame: FrameContext):
+        """
+        Record the cost of a frame, and warn if the rendering exceeds the frame budget.
+        """
+        self.render_stats.add_frame(time.perf_counter_ns() - frame.now)
+        msg = self.render_stats.check_budget(frame.elapsed)
+        if msg is not None:
+            warnings.warn(msg, RuntimeWarning, stacklevel=2)
+
+    def make_indeterminate_bar(self, line_width: int) -> str:
+        """
+        Build the animated bar used when the total is unknown. Each cell displays a frame of the spinner, shifted by
+        one frame from its neighbour, so the animation travels along the bar (10 frames per second).
+        :param line_width: The width of the bar in columns
+        :return: The bar
+        """
+        frames = self.spinner
+        # Emojis are two columns wide
+        cell_width = 2 if any(unicodedata.east_asian_width(c) in ("W", "F") for c in frames[0]) else len(frames[0])
+        n_cells = max(line_width // max(cell_width, 1), 0)
+        offset = int(self.elapsed * 10)
+        n = len(frames)
+        return "".join(frames[(offset - i) % n] for i in range(n_cells))
+
+    def make_done_line(self) -> str:
+        """
+        Build the line of the progress bar when it is done, widgets included.
+        :return: The line, without the carriage return and the clear line escape sequences
+        """
+        if self.aggregators:
+            self.aggregates()
+        self._frame = frame = self.make_frame()
+        try:
+            line = self._make_done_line()
+        finally:
+            self._frame = None
+        if self.render_stats is not None:
+            self._record_frame(frame)
+        return line
+
+    def _make_done_line(self) -> str:
+        preline, pre_width = self._render_widgets(self.pre_cb)
+        postline, post_width = self._render_widgets(self.post_cb, self._post_prefix())
+        line_width = self._frame.term_width - pre_width - post_width - 5
         if line_width < 0:
             line_width = 0
         if line_width > self.max_c:
             line_width = self.max_c
-        line = f"{self.done_delim[0]}{self.done_charac * line_width}{self.done_charac}{self.done_delim[1]}  {ResetColor()}"
+        line = f"{self.done_delim[0]}{self.done_charac * line_width}{self.done_charac}{self.done_delim[1]}  {_RESET}"
         if self.done_color is not None:
-            # Clear console
-            print(f"\r\033[K", end="")
-            # Display the line
-            print(f"\r{self.done_color}" + preline + line + f"{self.done_color}" + postline, end=f"{ResetColor()}{self.end}")
+            color = str(self.done_color)
+            return color + preline + line + color + postline + _RESET
+        else:
+            return preline + line + postline
+
+    def display_loading_bar(self):
+        if self.output != "tty":
+            self._display_log_line()
+            return
+        line = self.make_loading_line()
+        self._last_display_ns = time.perf_counter_ns()
+        if self.group is not None:
+            self.group.draw(self, line)
+        else:
+            # Clear the console line and display the line in a single write
+            print(f"\r\033[K{line}", end="")
+
+    def display_done_bar(self):
+        if self.output != "tty":
+            self._display_log_line(done=True)
+            return
+        line = self.make_done_line()
+        if self.group is not None:
+            self.group.done(self, line)
+        else:
+            # Clear the console line and display the line in a single write
+            print(f"\r\033[K{line}", end=self.end)
+
+    def make_log_record(self) -> Dict[str, Any]:
+        """
+        Make the record printed by the 'text' and 'json' outputs.
+        :return: The record with the count, total, percentage, rate (items/s), elapsed time and eta (seconds), the share
+        of each phase (If measured), and the reported values
+        """
+        if self.aggregators:
+            self.aggregates()
+        frame = self.make_frame()
+        record = dict(desc=self.desc, count=frame.count, total=self.total)
+        if frame.fraction is not None:
+            record["percent"] = round(100 * frame.fraction, 2)
+        rate = frame.rate
+        record["rate"] = round(rate, 4) if rate != 0 else None
+        record["elapsed"] = round(frame.elapsed, 3)
+        eta = frame.eta
+        if eta is not None:
+            record["eta"] = round(eta, 3)
+        shares = self.phase_shares
+        if len(shares) > 0:
+            record["phases"] = {name: round(share, 4) for name, share in shares.items()}
+        for k, v in self.added_values.items():
+            if isinstance(v, (int, float, str, bool)):
+                record[k] = v
+        return record
+
+    def _display_log_line(self, done: bool = False):
+        """
+        Print a log line if the log interval has elapsed, or if enough progress was made since the last one.
+        """
+        now = time.perf_counter_ns()
+        self._last_display_ns = now
+        if not done and self._last_log_ns is not None:
+            interval_elapsed = now - self._last_log_ns >= self.log_interval * 1e9
+            step_done = bool(self.total) and (self.count - self._last_log_count) / self.total >= self.log_step
+            if not interval_elapsed and not step_done:
+                return
+        self._last_log_ns = now
+        self._last_log_count = self.count
+
+        record = self.make_log_record()
+        if done:
+            record["done"] = True
+        if self.output == "json":
+            print(json.dumps(record), flush=True)
+            return
+        parts = []
+        if self.desc:
+            parts.append(f"{self.desc}:")
+        if self.total is not None:
+            percent = f" ({record['percent']:.0f}%)" if "percent" in record else ""
+            parts.append(f"{self.count}/{self.total}{percent}")
         else:
-            # Clear console
-            print(f"\r\033[K", end="")
-            # Display the line
-            print("\r" + preline + line + postline, end=self.end)
+            parts.append(f"{self.count}")
+        unit = self.added_values.get("unit", "it")
+        if record["rate"] is not None:
+            parts.append(f"| {record['rate']:.2f} {unit}/s")
+        parts.append(f"| elapsed {format_seconds_to_hms(record['elapsed'])}")
+        if "eta" in record and not done:
+            parts.append(f"| eta {format_seconds_to_hms(record['eta'])}")
+        if "phases" in record:
+            parts.append("| " + " | ".join(f"{name} {share:.0%}" for name, share in record["phases"].items()))
+        values = [f"{k}: {v:.4f}" for k, v in self.added_values.items() if isinstance(v, (int, float)) and not isinstance(v, bool)]
+        if len(values) > 0:
+            parts.append("| " + "  ".join(values))
+        if done:
+            parts.append("| done")
+        print(" ".join(parts), flush=True)
 
     def update(self, current: int, **kwargs):
-        self.last_count = self.count
         self.count = current
         self.report(**kwargs)
 
+        # In threaded mode, the renderer takes care of timing and display until the end
+        done = self.total is not None and self.count >= self.total
+        if self.threaded and self.display and not done:
+            if self._renderer is None:
+                self.prep_step_duration()
+                self._start_renderer()
+            return
+        self._stop_renderer()
+
         # Measure the duration of each steps
-        self.prep_step_duration()
+        now = time.perf_counter_ns()
+        self.prep_step_duration(now)
+        if self.reporter is not None:
+            if done:
+                self.reporter.send(self, done=True)
+            else:
+                self.reporter.maybe_send(self, now)
 
         # Early return because we do not want to display the progress bar yet (If true)
-        if (datetime.now() - self.last_display).total_seconds() < self.refresh_rate and self.count < self.total:
+        if now - self._last_display_ns < self._refresh_ns and not done:
             return
 
         # Display progress bar
         if self.display:
-            if self.count >= self.total:
+            if done:
                 self.display_done_bar()
             else:
                 self.display_loading_bar()
+        if done and self.metrics is not None:
+            self.metrics.finish(self)
 
     def return_fn(self, ne):
+        # With a weight, the count is in weighted units: the index is the index of the item
+        index = self._index - 1 if self.weight is not None else self.count - 1
         if self._enum and self._ref:
-            return self.count - 1, self, ne
+            return index, self, ne
         elif self._enum:
-            return self.count - 1, ne
+            return index, ne
         elif self._ref:
             return self, ne
         else:
@@ -511,30 +1920,168 @@ class progress:
         return self
 
     def report(self, **kwargs):
-        self.added_values.update(kwargs)
+        """
+        Report values to display in the progress bar. The values of the keys given to the `aggregate` parameter are
+        aggregated (mean, ema, min, max) instead of replaced. Aggregating is O(1) and the values are only converted when
+        a frame is rendered, so NumPy scalars or 0-d arrays can be reported at each step. With a `history`, the values
+        are also recorded every `stride` steps.
+        """
+        if self.history is not None:
+            self.history.record(self, kwargs)
+        if not self.aggregators:
+            self.added_values.update(kwargs)
+            return
+        for k, v in kwargs.items():
+            agg = self.aggregators.get(k)
+            if agg is not None:
+                agg.add(v)
+            else:
+                self.added_values[k] = v
+
+    def aggregates(self) -> Dict[str, Optional[float]]:
+        """
+        Compute the aggregates of the reported values, and update the displayed values.
+        :return: The aggregate of each key given to the `aggregate` parameter (None if no value was reported)
+        """
+        out = {}
+        for k, agg in self.aggregators.items():
+            value = out[k] = agg.value
+            if value is not None:
+                self.added_values[k] = value
+        return out
 
     def get_term_width(self):
         if self.ignore_term_width:
             return 1000
         else:
-            return shutil.get_terminal_size().columns
+            return get_terminal_columns()
 
-    def make_preline(self):
-        pre = []
-        for cb in self.pre_cb:
-            pre.append(cb(self))
+    def _render_widgets(self, cbs: Sequence[Callable[['progress'], str]], prefix: str = "") -> Tuple[str, int]:
+        """
+        Render a sequence of widgets. The output of static widgets is cached with its visible part.
+        :param cbs: The widgets
+        :param prefix: A string added before the output of each widget (color)
+        :return: The rendered widgets separated by spaces, and the visible width of the result
+        """
+        parts = []
+        visible = []
+        render_stats = self.render_stats
+        for cb in cbs:
+            if getattr(cb, "static", False):
+                cached = self._static_cache.get(cb)
+                if cached is None:
+                    out = cb(self)
+                    cached = self._static_cache[cb] = (out, _ESC_RE.sub('', out))
+                out, vis = cached
+            elif render_stats is None:
+                out = cb(self)
+                vis = _ESC_RE.sub('', out)
+            else:
+                start = time.perf_counter_ns()
+                out = cb(self)
+                render_stats.add_widget(cb, time.perf_counter_ns() - start)
+                vis = _ESC_RE.sub('', out)
+            parts.append(prefix + out)
+            visible.append(vis)
+        return " ".join(parts), len(" ".join(visible).rstrip())
 
-        return " ".join(pre)
+    def _post_prefix(self) -> str:
+        color = self.done_color if self.iter_ended else self.color
+        return str(color) if color is not None else _RESET
+
+    def make_preline(self):
+        return self._render_widgets(self.pre_cb)[0]
 
     def make_postline(self):
-        color = self.done_color if self.iter_ended else self.color
-        if color is None:
-            color = ResetColor()
-        post = []
-        for cb in self.post_cb:
-            post.append(str(color) + cb(self))
+        return self._render_widgets(self.post_cb, self._post_prefix())[0]
+
+def _iter_chunks(obj, n: int, chunk_size: int):
+    for start in range(0, n, chunk_size):
+        yield obj[start:start + chunk_size]
+
+class ProgressFile:
+    """
+    A file object wrapper that tracks the bytes read or written with a progress bar. Create it with
+    `progress.wrap_file`. It supports `read`, `readinto`, `readline`, `write`, iteration over lines and iteration over
+    chunks with `chunks`. Other attributes are forwarded to the file object.
+
+    Reading with `readinto` or `chunks` doesn't create intermediate buffers: the bytes are read directly in the given
+    buffer (Or in a single reusable buffer with `chunks`).
+    """
+    def __init__(self, file: IO, bar: progress):
+        self.file = file
+        self.bar = bar
+
+    def read(self, size: int = -1):
+        data = self.file.read(size)
+        if data:
+            self.bar.advance(len(data))
+        elif size != 0:
+            self._done()
+        return data
+
+    def readinto(self, b) -> Optional[int]:
+        n = self.file.readinto(b)
+        if n:
+            self.bar.advance(n)
+        elif n == 0 and len(b) > 0:
+            self._done()
+        return n
+
+    def readline(self, size: int = -1):
+        line = self.file.readline(size)
+        if line:
+            self.bar.advance(len(line))
+        else:
+            self._done()
+        return line
+
+    def write(self, b) -> Optional[int]:
+        n = self.file.write(b)
+        self.bar.advance(n if n is not None else memoryview(b).nbytes)
+        return n
+
+    def chunks(self, chunk_size: int = 1 << 20) -> Iterator[memoryview]:
+        """
+        Iterate over the file by chunks. The chunks are views of a single buffer that is reused: a chunk is only valid
+        until the next one is read. Copy it (bytes(chunk)) if you need to keep it.
+        :param chunk_size: The maximum size of the chunks in bytes
+        :return: An iterator of memoryviews
+        """
+        view = memoryview(bytearray(chunk_size))
+        while True:
+            n = self.readinto(view)
+            if not n:
+                break
+            yield view[:n]
+
+    def __iter__(self):
+        for line in self.file:
+            self.bar.advance(len(line))
+            yield line
+        self._done()
+
+    def _done(self):
+        if not self.bar.iter_ended:
+            self.bar._finish()
+
+    def close(self):
+        """
+        Close the file and display the done bar.
+        """
+        self.file.close()
+        self._done()
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def __enter__(self) -> 'ProgressFile':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        self.close()
+        return False
 
-        return " ".join(post)
 
 def prange(*args, **kwargs):
     return progress(range(*args), **kwargs)
@@ -582,6 +2129,27 @@ progress.set_config(
     )
 )
 
+progress.set_config(
+    done_color=Color(247),
+    type="bytes",
+    cursors=(f"{Color(8)}╺", f"╸{Color(8)}"),
+    cu="━",
+    cd="━",
+    max_width=40,
+    ignore_term_width="PYCHARM_HOSTED" in os.environ,
+    delim=(f"   {Color(197)}", f"{ResetColor()}"),
+    done_delim=(f"   {Color(10)}", f"{ResetColor()}"),
+    done_charac=f"━",
+    pre_cb=(
+        format_desc,
+    ),
+    post_cb=(
+        format_bytes_total,
+        format_bytes_speed,
+        format_pip_eta
+    )
+)
+
 if __name__ == "__main__":
     import time
 
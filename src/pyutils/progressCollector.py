@@ -0,0 +1,263 @@
+import os
+import sys
+import time
+import socket
+import struct
+import argparse
+import threading
+from typing import *
+from .progress import progress, format_worker_speed
+
+# Update sent by a rank: magic, version, rank, count, total (-1 if unknown), rate (it/s), elapsed (s), done
+_PACKET = struct.Struct("<2sHIqqdd?")
+_MAGIC = b"PG"
+_VERSION = 1
+
+Address = Union[str, Tuple[str, int]]
+
+
+def _make_socket(address: Address) -> socket.socket:
+    if isinstance(address, str):
+        return socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    return socket.socket(socket.AF_INET6 if ":" in address[0] else socket.AF_INET, socket.SOCK_DGRAM)
+
+
+class ProgressReporter:
+    """
+    Send the progress of a rank (process or node) to a `ProgressCollector`. Each update is a datagram of 41 bytes sent
+    over a Unix socket (Local processes) or UDP (Nodes), at most every `interval` seconds. Sending never blocks: if the
+    collector is not running or can't keep up, the update is dropped, and the next one replaces it.
+
+    Give the reporter to the progress bar of each rank. Usually, the bars of the ranks are not displayed:
+    ```
+    reporter = ProgressReporter("/tmp/train.sock", rank=rank)
+    for batch in progress(loader, reporter=reporter, display=False):
+        ...
+    ```
+    """
+    def __init__(self, address: Address, rank: Optional[int] = None, interval: float = 0.5):
+        """
+        :param address: The path of the Unix socket, or the (host, port) of the UDP socket of the collector
+        :param rank: The rank of this process. If None, the RANK environment variable is used (Set by torchrun), else 0.
+        :param interval: The minimum time between two updates, in seconds
+        """
+        self.address = address
+        self.rank = rank if rank is not None else int(os.environ.get("RANK", 0))
+        self.interval = interval
+        self._interval_ns = int(interval * 1e9)
+        self._next_send_ns = 0
+        self._sock = _make_socket(address)
+        self._sock.setblocking(False)
+
+    def maybe_send(self, bar: 'progress', now: int):
+        """
+        Send an update if the interval has elapsed since the last one. It is called by the progress bar each time it
+        reads the clock.
+        :param bar: The progress bar
+        :param now: The current time given by time.perf_counter_ns
+        :return: None
+        """
+        if now >= self._next_send_ns:
+            self._next_send_ns = now + self._interval_ns
+            self.send(bar)
+
+    def send(self, bar: 'progress', done: bool = False):
+        """
+        Send an update now.
+        :param bar: The progress bar
+        :param done: Whether the rank is done
+        :return: None
+        """
+        total = bar.total if bar.total is not None else -1
+        packet = _PACKET.pack(_MAGIC, _VERSION, self.rank, int(bar.count), int(total), float(bar.rate),
+                              float(bar.elapsed), done)
+        try:
+            self._sock.sendto(packet, self.address)
+        except OSError:
+            # No collector, or its buffer is full: drop the update
+            pass
+
+    def close(self):
+        self._sock.close()
+
+
+class RankState:
+    """
+    The last update received from a rank
+    """
+    __slots__ = ("rank", "count", "total", "rate", "elapsed", "done", "received")
+
+    def __init__(self, rank: int, count: int, total: Optional[int], rate: float, elapsed: float, done: bool,
+                 received: float):
+        self.rank = rank
+        self.count = count
+        self.total = total
+        self.rate = rate
+        self.elapsed = elapsed
+        self.done = done
+        self.received = received
+
+    def __repr__(self):
+        return f"RankState(rank={self.rank}, count={self.count}, total={self.total}, rate={self.rate:.2f}, done={self.done})"
+
+
+class ProgressCollector:
+    """
+    Receive the updates of the ranks (See `ProgressReporter`) and display one aggregate progress bar: the sum of the
+    counts over the sum of the totals, with the speed of the slowest and fastest rank. The speed of each rank is
+    available in `ranks`, so slow ranks can be found.
+
+    The collector can run in a thread of the main process:
+    ```
+    with ProgressCollector("/tmp/train.sock", n_ranks=8, desc="train"):
+        ... # Start the ranks and wait for them
+    ```
+    Or in its own process: `python -m pyutils.progressCollector /tmp/train.sock --ranks 8`
+    """
+    def __init__(self, address: Address, n_ranks: Optional[int] = None, **kwargs):
+        """
+        :param address: The path of the Unix socket, or the (host, port) of the UDP socket to listen on. A Unix socket
+        file is created, and removed on close.
+        :param n_ranks: The number of ranks. The aggregate bar is done when all of them are done. If None, the number
+        of ranks is the number of ranks that sent an update.
+        :param kwargs: The parameters of the aggregate progress bar
+        """
+        self.address = address
+        self.n_ranks = n_ranks
+        self.ranks: Dict[int, RankState] = {}
+        if isinstance(address, str) and os.path.exists(address):
+            os.unlink(address)
+        self._sock = _make_socket(address)
+        self._sock.bind(address)
+        self._sock.settimeout(0.1)
+        if "post_cb" not in kwargs:
+            # Display the speed of the slowest and fastest rank
+            config = progress.CONFIGS[kwargs.get("type", "default")]
+            kwargs["post_cb"] = config.post_cb + (format_worker_speed,)
+        self.bar = progress(**kwargs)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _receive(self):
+        try:
+            data = self._sock.recv(_PACKET.size)
+        except socket.timeout:
+            return
+        if len(data) != _PACKET.size:
+            return
+        magic, version, rank, count, total, rate, elapsed, done = _PACKET.unpack(data)
+        if magic != _MAGIC or version != _VERSION:
+            return
+        self.ranks[rank] = RankState(rank, count, total if total >= 0 else None, rate, elapsed, done, time.monotonic())
+
+    @property
+    def done(self) -> bool:
+        """
+        Whether all the ranks are done
+        """
+        n_ranks = self.n_ranks if self.n_ranks is not None else len(self.ranks)
+        return len(self.ranks) >= n_ranks > 0 and all(state.done for state in self.ranks.values())
+
+    def _update_bar(self, final: bool = False):
+        states = [self.ranks[rank] for rank in sorted(self.ranks)]
+        n_ranks = self.n_ranks if self.n_ranks is not None else len(states)
+        totals = [state.total for state in states]
+        if len(states) >= n_ranks and None not in totals:
+            self.bar.total = sum(totals)
+        self.bar.worker_counts = [state.count for state in states]
+        self.bar.worker_rates = [state.rate for state in states]
+        count = sum(self.bar.worker_counts)
+        if final:
+            self.bar.count = count
+            self.bar._finish()
+        elif self.bar.total is None or count < self.bar.total:
+            # The done bar is displayed once all the ranks are done
+            self.bar.update(count)
+
+    def run(self, timeout: Optional[float] = None) -> Dict[int, RankState]:
+        """
+        Receive the updates until all the ranks are done, the timeout expires, or the collector is closed.
+        :param timeout: The maximum time to wait for the ranks, in seconds
+        :return: The last state of each rank
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        next_draw = 0.
+        while not self._stop.is_set():
+            self._receive()
+            if self.done:
+                break
+            now = time.monotonic()
+            if self.ranks and now >= next_draw:
+                next_draw = now + self.bar.refresh_rate
+                self._update_bar()
+            if deadline is not None and now >= deadline:
+                break
+        if self.ranks and not self.bar.iter_ended:
+            self._update_bar(final=True)
+        return self.ranks
+
+    def start(self) -> 'ProgressCollector':
+        """
+        Run the collector in a daemon thread.
+        :return: The collector
+        """
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """
+        Stop the collector, and close the socket.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._sock.close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+    def join(self, timeout: Optional[float] = None):
+        """
+        Wait for the collector thread to end (All the ranks are done).
+        :param timeout: The maximum time to wait, in seconds
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def __enter__(self) -> 'ProgressCollector':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Let the collector receive the last updates of the ranks
+        if exc_type is None:
+            self.join(timeout=2 * self.bar.refresh_rate + 1)
+        self.close()
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Display the aggregate progress of multiple ranks")
+    parser.add_argument("address", help="The path of the Unix socket, or host:port for UDP")
+    parser.add_argument("--ranks", type=int, default=None, help="The number of ranks")
+    parser.add_argument("--desc", default="", help="The description of the progress bar")
+    parser.add_argument("--type", default="default", help="The type of the progress bar")
+    parser.add_argument("--timeout", type=float, default=None, help="Stop after this number of seconds")
+    args = parser.parse_args()
+    address = args.address
+    if ":" in address and os.path.sep not in address:
+        host, port = address.rsplit(":", 1)
+        address = (host, int(port))
+    collector = ProgressCollector(address, n_ranks=args.ranks, desc=args.desc, type=args.type)
+    try:
+        ranks = collector.run(args.timeout)
+    except KeyboardInterrupt:
+        ranks = collector.ranks
+    finally:
+        collector.close()
+    for state in ranks.values():
+        print(f"rank {state.rank}: {state.count}/{state.total} {state.rate:.2f} it/s {'done' if state.done else ''}",
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
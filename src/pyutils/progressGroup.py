@@ -0,0 +1,127 @@
+import threading
+from typing import *
+from .progress import progress
+
+
+class ProgressGroup:
+    """
+    Display multiple progress bars at the same time (Nested loops, parallel downloads, etc.) without them overwriting
+    each other. The group owns a region of the terminal with one line per active progress bar. Each time a bar is
+    refreshed, only the lines whose content changed are redrawn, in a single write. When a bar is done, it is moved
+    above the region, in the scrollback, and the region shrinks.
+
+    Any progress bar type (default, dl, pip or your own) can be used in a group. Example:
+    ```
+    with ProgressGroup() as group:
+        for epoch in group.progress(range(10), desc="Epochs"):
+            for batch in group.progress(dataloader, type="dl"):
+                ...
+    ```
+    The progress bars are also thread safe in a group, so they can be updated from different threads.
+
+    Note:
+        Do not print while the group is active, it would break the region. Use the `write` method instead.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bars: List[progress] = []
+        self._lines: Dict[int, str] = {}    # Last line of each bar, keyed by id
+        self._drawn: List[str] = []    # Lines currently on screen
+        self._scrollback: List[str] = []    # Lines waiting to be written above the region
+
+    def progress(self, it: Optional[Iterable] = None, **kwargs) -> progress:
+        """
+        Create a progress bar that belongs to this group. It takes the same arguments as the progress class.
+        """
+        return progress(it, group=self, **kwargs)
+
+    def draw(self, bar: progress, line: str):
+        """
+        Called by the progress bars of the group when they are refreshed.
+        :param bar: The progress bar
+        :param line: Its new line
+        :return: None
+        """
+        with self._lock:
+            if id(bar) not in self._lines:
+                self._bars.append(bar)
+            self._lines[id(bar)] = line
+            self._flush()
+
+    def done(self, bar: progress, line: str):
+        """
+        Called by the progress bars of the group when they are done. The bar is removed from the region and its line
+        is written in the scrollback.
+        :param bar: The progress bar
+        :param line: Its done line
+        :return: None
+        """
+        with self._lock:
+            self._remove(bar)
+            self._scrollback.append(line)
+            self._flush()
+
+    def write(self, msg: str):
+        """
+        Print a message above the progress bars.
+        :param msg: The message
+        :return: None
+        """
+        with self._lock:
+            self._scrollback.extend(msg.split("\n"))
+            self._flush()
+
+    def close(self):
+        """
+        Move the bars that are not done in the scrollback, so they stay visible, and release the terminal.
+        """
+        with self._lock:
+            for bar in self._bars:
+                self._scrollback.append(self._lines[id(bar)])
+            self._bars.clear()
+            self._lines.clear()
+            self._flush()
+
+    def __enter__(self) -> 'ProgressGroup':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        self.close()
+        return False
+
+    def _remove(self, bar: progress):
+        if id(bar) in self._lines:
+            self._bars.remove(bar)
+            del self._lines[id(bar)]
+
+    def _flush(self):
+        """
+        Write a frame. The cursor is expected to be at the beginning of the last line of the region, and it is left
+        there. Must be called with the lock acquired.
+        """
+        out = []
+        # Go back to the top of the region
+        if len(self._drawn) > 1:
+            out.append(f"\033[{len(self._drawn) - 1}A")
+        out.append("\r")
+
+        # Lines written in the scrollback shift the whole region, so everything must be redrawn
+        for line in self._scrollback:
+            out.append(f"\033[K{line}\n")
+        redraw = len(self._scrollback) > 0
+        self._scrollback.clear()
+
+        lines = [self._lines[id(bar)] for bar in self._bars]
+        shrink = len(lines) < len(self._drawn)
+        for i, line in enumerate(lines):
+            # When shrinking, the last line is always redrawn to leave the cursor at its end before clearing below
+            last = shrink and i == len(lines) - 1
+            if redraw or last or i >= len(self._drawn) or self._drawn[i] != line:
+                out.append(f"\033[K{line}")
+            if i < len(lines) - 1:
+                out.append("\n")
+        # Clear the lines of the bars that were removed
+        if shrink:
+            out.append("\033[J")
+        self._drawn = lines
+        print("".join(out), end="")
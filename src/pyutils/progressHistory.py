@@ -0,0 +1,151 @@
+import os
+import math
+from array import array
+from typing import *
+
+if TYPE_CHECKING:
+    from .progress import progress
+
+
+class MetricsHistory:
+    """
+    Record the values reported to a progress bar (`bar.report(loss=...)`) to build training curves. Each metric is
+    stored in a compact column (`array.array` of doubles, 8 bytes per value), next to the step (The count of the bar)
+    and the elapsed time. Example:
+    ```
+    history = MetricsHistory(stride=10)
+    bar = progress(loader, type="dl", history=history)
+    for batch in bar:
+        ...
+        bar.report(loss=loss.item())
+    history.to_csv("train.csv")
+    ```
+    A row is recorded at most every `stride` steps. Values reported more than once for the same step are merged in the
+    same row. Metrics that were not reported in a row are NaN. When the number of rows reaches `max_rows`, every other
+    row is dropped and the stride is doubled, so the memory stays bounded on long runs while the whole run is covered.
+    """
+    def __init__(self, stride: int = 1, max_rows: int = 100_000):
+        """
+        :param stride: The minimum number of steps between two rows
+        :param max_rows: The maximum number of rows. Reaching it halves the resolution of the history.
+        """
+        if stride < 1:
+            raise ValueError(f"stride must be at least 1, got {stride}")
+        if max_rows < 2:
+            raise ValueError(f"max_rows must be at least 2, got {max_rows}")
+        self.stride = stride
+        self.max_rows = max_rows
+        self.steps = array("q")
+        self.times = array("d")
+        self.metrics: Dict[str, array] = {}
+        self._next_step = 0
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def record(self, bar: 'progress', values: Mapping[str, Any]):
+        """
+        Record reported values, if `stride` steps were done since the last row. It is called by the progress bar each
+        time values are reported. The elapsed time is only read when a row is recorded.
+        :param bar: The progress bar
+        :param values: The reported values. Values that are not numbers are ignored.
+        :return: None
+        """
+        step = bar.count
+        n = len(self.steps)
+        if n > 0 and step == self.steps[-1]:
+            # Same step: merge in the last row
+            self._set(values, n - 1)
+            return
+        if step < self._next_step:
+            return
+        if n >= self.max_rows:
+            self._downsample()
+            n = len(self.steps)
+        self._next_step = step + self.stride
+        self.steps.append(step)
+        self.times.append(bar.elapsed)
+        for col in self.metrics.values():
+            col.append(math.nan)
+        self._set(values, n)
+
+    def finish(self, bar: 'progress'):
+        """
+        Record the last values of a progress bar that ended (Including the aggregates), even if less than `stride` steps
+        were done since the last row.
+        :param bar: The progress bar
+        :return: None
+        """
+        self._next_step = 0
+        self.record(bar, bar.added_values)
+
+    def _set(self, values: Mapping[str, Any], row: int):
+        for k, v in values.items():
+            if isinstance(v, (str, bytes)):
+                continue
+            try:
+                v = float(v)
+            except (TypeError, ValueError):
+                continue
+            col = self.metrics.get(k)
+            if col is None:
+                # New metric: NaN in the previous rows
+                col = self.metrics[k] = array("d", [math.nan]) * len(self.steps)
+            col[row] = v
+
+    def _downsample(self):
+        del self.steps[1::2]
+        del self.times[1::2]
+        for col in self.metrics.values():
+            del col[1::2]
+        self.stride *= 2
+
+    def columns(self) -> Dict[str, array]:
+        """
+        The columns of the history: `step`, `time` (Elapsed seconds) and one column per metric. The arrays are not
+        copied.
+        """
+        return dict(step=self.steps, time=self.times, **self.metrics)
+
+    def to_csv(self, path: Union[str, os.PathLike, IO[str]]):
+        """
+        Write the history in a CSV file, one row per recorded step. The rows are written one by one from the columns.
+        :param path: The path of the file, or a text file object
+        :return: None
+        """
+        if not hasattr(path, "write"):
+            with open(path, "w", newline="") as f:
+                return self.to_csv(f)
+        columns = self.columns()
+        path.write(",".join(columns) + "\n")
+        for row in zip(*columns.values()):
+            path.write(",".join(map(repr, row)) + "\n")
+
+    def to_npz(self, path: Union[str, os.PathLike, IO[bytes]]):
+        """
+        Save the history in a NumPy `.npz` file, one array per column. The columns are passed to NumPy without
+        conversion. It requires NumPy.
+        :param path: The path of the file, or a binary file object
+        :return: None
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError("NumPy is required to export the history to a .npz file. Use to_csv instead.") from None
+        arrays = {k: np.frombuffer(col, dtype=np.int64 if col.typecode == "q" else np.float64)
+                  for k, col in self.columns().items()}
+        np.savez(path, **arrays)
+
+    def state_dict(self) -> Dict[str, Any]:
+        return dict(stride=self.stride, next_step=self._next_step, steps=self.steps.tolist(),
+                    times=self.times.tolist(), metrics={k: col.tolist() for k, col in self.metrics.items()})
+
+    def load_state_dict(self, state: Dict[str, Any]):
+        self.stride = state["stride"]
+        self._next_step = state["next_step"]
+        self.steps = array("q", state["steps"])
+        self.times = array("d", state["times"])
+        self.metrics = {k: array("d", col) for k, col in state["metrics"].items()}
+
+    def __repr__(self):
+        return f"MetricsHistory(rows={len(self)}, stride={self.stride}, metrics={list(self.metrics)})"
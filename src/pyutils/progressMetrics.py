@@ -0,0 +1,247 @@
+import os
+import math
+import time
+import weakref
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import *
+
+if TYPE_CHECKING:
+    from .progress import progress
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+def sample(bar: 'progress') -> Dict[str, Any]:
+    """
+    Read the state of a progress bar. It only reads attributes, so it can be called from any thread.
+    :param bar: The progress bar
+    :return: A dict with the count, total, rate, eta, elapsed, done and the numeric added values
+    """
+    values = {}
+    # Copy the items first, the iterating thread can report new values at any time
+    for k, v in list(bar.added_values.items()):
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            values[k] = v
+        elif hasattr(v, "item") and getattr(v, "ndim", 1) == 0:
+            # NumPy and torch scalars
+            values[k] = v.item()
+    return dict(
+        count=bar.count,
+        total=bar.total,
+        rate=bar.rate,
+        eta=bar.eta,
+        elapsed=bar.elapsed if bar.has_initialized else 0.,
+        done=bar.iter_ended or (bar.total is not None and bar.count >= bar.total),
+        values=values
+    )
+
+
+class MetricsExporter:
+    """
+    Publish the state of progress bars in the Prometheus text format, so headless jobs can be monitored from dashboards.
+    The metrics are written to a textfile (For node-exporter's textfile collector), served by a small HTTP server, or
+    both. Example:
+    ```
+    exporter = MetricsExporter(path="/var/lib/node_exporter/train.prom", port=9101)
+    for batch in progress(loader, desc="train", metrics=exporter):
+        ...
+    ```
+    Each bar is identified by the `bar` label, which is its description. Bars with the same description are published
+    under the same series, so a bar recreated at each epoch keeps its series. The metrics are:
+    - `<prefix>_steps_total`: The count
+    - `<prefix>_total_steps`: The total (Omitted if unknown)
+    - `<prefix>_rate`: The number of steps per second
+    - `<prefix>_eta_seconds`: The estimated remaining time (Omitted if unknown)
+    - `<prefix>_elapsed_seconds`: The elapsed time
+    - `<prefix>_done`: 1 if the bar is done, else 0
+    - `<prefix>_value{key="..."}`: The numeric values reported to the bar
+
+    The exporter runs in a daemon thread and reads the bars every `interval` seconds. The iterating thread never waits
+    for it: registering a bar and notifying the end of a bar are O(1).
+    """
+    def __init__(self, path: Optional[str] = None, port: Optional[int] = None, host: str = "127.0.0.1",
+                 interval: float = 5., prefix: str = "progress"):
+        """
+        :param path: The path of the textfile. It is rewritten atomically (Written in a temporary file, then renamed).
+        :param port: The port of the HTTP server. The metrics are served on any path. Use 0 to pick a free port.
+        :param host: The address the HTTP server listens on.
+        :param interval: The time between two updates of the metrics, in seconds.
+        :param prefix: The prefix of the metric names.
+        """
+        if path is None and port is None:
+            raise ValueError("Give a path, a port or both to export the metrics.")
+        self.path = path
+        self.interval = interval
+        self.prefix = prefix
+        self._bars: Dict[str, weakref.ref] = {}
+        self._final: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._payload = b""
+        self._wake = threading.Event()
+        self._stop = False
+
+        self._server: Optional[ThreadingHTTPServer] = None
+        if port is not None:
+            exporter = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    payload = exporter._payload
+                    self.send_response(200)
+                    self.send_header("Content-Type", CONTENT_TYPE)
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer((host, port), Handler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    @property
+    def port(self) -> Optional[int]:
+        """
+        The port of the HTTP server, if any
+        """
+        return self._server.server_address[1] if self._server is not None else None
+
+    def register(self, bar: 'progress'):
+        """
+        Start publishing a progress bar. It is done by the progress bar when given as `metrics` parameter.
+        :param bar: The progress bar
+        :return: None
+        """
+        key = bar.desc or "progress"
+        with self._lock:
+            self._bars[key] = weakref.ref(bar)
+            self._final.pop(key, None)
+
+    def finish(self, bar: 'progress'):
+        """
+        Keep the last state of a progress bar that ended, and publish it without waiting for the next update.
+        :param bar: The progress bar
+        :return: None
+        """
+        key = bar.desc or "progress"
+        state = sample(bar)
+        with self._lock:
+            ref = self._bars.get(key)
+            if ref is not None and ref() is bar:
+                del self._bars[key]
+            self._final[key] = state
+        self._wake.set()
+
+    def render(self) -> str:
+        """
+        Render the metrics of all the bars in the Prometheus text format.
+        """
+        with self._lock:
+            states = dict(self._final)
+            live = list(self._bars.items())
+        for key, ref in live:
+            bar = ref()
+            if bar is None:
+                # The bar was garbage collected without ending (break)
+                with self._lock:
+                    if self._bars.get(key) is ref:
+                        del self._bars[key]
+                continue
+            states[key] = sample(bar)
+
+        p = self.prefix
+        metrics: List[Tuple[str, str, str, Callable[[Dict[str, Any]], Optional[float]]]] = [
+            (f"{p}_steps_total", "counter", "Number of steps done.", lambda s: s["count"]),
+            (f"{p}_total_steps", "gauge", "Total number of steps.", lambda s: s["total"]),
+            (f"{p}_rate", "gauge", "Number of steps per second.", lambda s: s["rate"]),
+            (f"{p}_eta_seconds", "gauge", "Estimated remaining time in seconds.", lambda s: s["eta"]),
+            (f"{p}_elapsed_seconds", "gauge", "Elapsed time in seconds.", lambda s: s["elapsed"]),
+            (f"{p}_done", "gauge", "1 if the progress bar is done.", lambda s: int(s["done"])),
+        ]
+        lines = []
+        for name, kind, help, get in metrics:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, state in states.items():
+                value = get(state)
+                if value is not None:
+                    lines.append(f'{name}{{bar="{_escape(key)}"}} {_format_value(value)}')
+        lines.append(f"# HELP {p}_value Values reported to the progress bar.")
+        lines.append(f"# TYPE {p}_value gauge")
+        for key, state in states.items():
+            for k, v in state["values"].items():
+                lines.append(f'{p}_value{{bar="{_escape(key)}",key="{_escape(str(k))}"}} {_format_value(v)}')
+        return "\n".join(lines) + "\n"
+
+    def publish(self):
+        """
+        Render the metrics and publish them now. It is called periodically by the exporter thread.
+        :return: None
+        """
+        payload = self.render().encode("utf-8")
+        self._payload = payload
+        if self.path is not None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=".progress-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(payload)
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+
+    def _loop(self):
+        next_update = 0.
+        while not self._stop:
+            # Wait for the interval, or an earlier wake up when a bar ends. Updates stay at least 100ms apart.
+            self._wake.wait(max(next_update - time.monotonic(), 0.))
+            self._wake.clear()
+            if self._stop:
+                break
+            now = time.monotonic()
+            next_update = now + self.interval
+            try:
+                self.publish()
+            except OSError:
+                # Keep the job running if the textfile can't be written
+                pass
+            time.sleep(0.1)
+
+    def close(self):
+        """
+        Publish the metrics a last time and stop the exporter thread and the HTTP server.
+        :return: None
+        """
+        self._stop = True
+        self._wake.set()
+        self._thread.join()
+        self.publish()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self) -> 'MetricsExporter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
@@ -0,0 +1,506 @@
+import math
+from collections import deque
+from typing import *
+
+
+class ProgressStats:
+    """
+    Base class of the statistics engines of the progress bar. The engine is updated each time the progress bar measures
+    the duration of the steps. Since the clock is not read at every step, an update can cover multiple steps. In this
+    case, the step duration is the mean duration of these steps.
+
+    To make your own engine, subclass this class and give the class (or any callable returning an instance) to the
+    `stats` parameter of the progress bar. Each progress bar creates its own engine.
+    """
+    # If True, the progress bar reads the clock at every step, so each update covers a single step. It costs about 1µs
+    # per step, but the real distribution of the step duration can be measured.
+    per_step = False
+
+    def start(self, now: int, count: int):
+        """
+        Called at the first step.
+        :param now: The time given by time.perf_counter_ns
+        :param count: The count of the progress bar
+        :return: None
+        """
+        pass
+
+    def update(self, now: int, count: int, steps: int, step_duration: float):
+        """
+        Called each time the progress bar measures the duration of the steps. It must be O(1).
+        :param now: The time given by time.perf_counter_ns
+        :param count: The count of the progress bar
+        :param steps: The number of steps done since the last update
+        :param step_duration: The mean duration of these steps in seconds
+        :return: None
+        """
+        pass
+
+    @property
+    def rate(self) -> Optional[float]:
+        """
+        The number of steps per second. None if unknown, then the progress bar falls back to its EMA.
+        """
+        return None
+
+    def state_dict(self) -> Dict[str, Any]:
+        """
+        The state of the engine to resume it in another process (See `progress.save_state`). It must be JSON
+        serializable. Timestamps are meaningless in another process, so they must not be saved.
+        """
+        return {}
+
+    def load_state_dict(self, state: Dict[str, Any]):
+        """
+        Restore a state given by `state_dict`.
+        :param state: The state
+        :return: None
+        """
+        pass
+
+
+class WindowedStats(ProgressStats):
+    """
+    The default statistics engine. It computes:
+    - `rate`: The number of steps per second over a sliding time window. Unlike the EMA, it adapts quickly after a
+    warmup phase, whatever the total.
+    - With `percentiles=True`: `p50`, `p95`, `p99` (or any `percentile(q)`), the percentiles of the step duration in
+    seconds, estimated from a histogram with logarithmic bins (About 12% of relative error), and `min`, `max`, the
+    minimum and maximum step duration in seconds.
+
+    The distribution needs the duration of each step, while the progress bar usually reads the clock every few steps
+    and only knows the mean duration of these steps, which hides the tail. So, with `percentiles=True`, the progress bar
+    reads the clock at every step (About 1µs per step). Otherwise, the distribution is not computed (None).
+
+    Every update is O(1) and the memory is fixed.
+    """
+    # Histogram from 1ns to 10^5s with BINS_PER_DECADE bins per power of 10
+    BINS_PER_DECADE = 20
+    MIN_EXP = -9
+    MAX_EXP = 5
+
+    def __init__(self, window: float = 10., max_samples: int = 1024, percentiles: bool = False):
+        """
+        :param window: The length of the sliding window used to compute the rate, in seconds
+        :param max_samples: The maximum number of samples kept in the window
+        :param percentiles: Measure each step to compute the distribution of the step duration (percentiles, min, max)
+        """
+        self.per_step = percentiles
+        self.window = window
+        self._window_ns = int(window * 1e9)
+        self._samples: Deque[Tuple[int, int]] = deque(maxlen=max_samples)
+        # Sparse histogram: bin index -> number of steps. Only a few bins are used, and it is cheap to create.
+        self._hist: Dict[int, int] = {}
+        self._n_bins = (self.MAX_EXP - self.MIN_EXP) * self.BINS_PER_DECADE
+        self.n_steps = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def start(self, now: int, count: int):
+        self._samples.append((now, count))
+
+    def update(self, now: int, count: int, steps: int, step_duration: float):
+        # Sliding window
+        samples = self._samples
+        samples.append((now, count))
+        limit = now - self._window_ns
+        # Keep one sample older than the window, so the window is always covered
+        while len(samples) > 2 and samples[1][0] <= limit:
+            samples.popleft()
+
+        # Step duration distribution. A mean over multiple steps would hide the tail, so only single steps are recorded.
+        if steps != 1 or not self.per_step or step_duration <= 0:
+            return
+        if self.min is None or step_duration < self.min:
+            self.min = step_duration
+        if self.max is None or step_duration > self.max:
+            self.max = step_duration
+        idx = int((math.log10(step_duration) - self.MIN_EXP) * self.BINS_PER_DECADE)
+        if idx < 0:
+            idx = 0
+        elif idx >= self._n_bins:
+            idx = self._n_bins - 1
+        hist = self._hist
+        hist[idx] = hist.get(idx, 0) + steps
+        self.n_steps += steps
+
+    @property
+    def rate(self) -> Optional[float]:
+        if len(self._samples) < 2:
+            return None
+        t0, c0 = self._samples[0]
+        t1, c1 = self._samples[-1]
+        if t1 == t0:
+            return None
+        return (c1 - c0) / (t1 - t0) * 1e9
+
+    def state_dict(self) -> Dict[str, Any]:
+        # The window is rebuilt after resuming, only the distribution is kept (Sparse histogram)
+        return dict(
+            hist={str(idx): n for idx, n in self._hist.items()},
+            n_steps=self.n_steps,
+            min=self.min,
+            max=self.max
+        )
+
+    def load_state_dict(self, state: Dict[str, Any]):
+        self._hist = {int(idx): n for idx, n in state.get("hist", {}).items()}
+        self.n_steps = state.get("n_steps", 0)
+        self.min = state.get("min")
+        self.max = state.get("max")
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Estimate a percentile of the step duration.
+        :param q: The percentile, between 0 and 100
+        :return: The step duration in seconds, or None if no step was measured (Or `percentiles` is False)
+        """
+        if self.n_steps == 0:
+            return None
+        target = q / 100 * self.n_steps
+        cumul = 0
+        for idx in sorted(self._hist):
+            n = self._hist[idx]
+            cumul += n
+            if cumul >= target and n > 0:
+                # Geometric center of the bin, bounded by the observed extremes
+                value = 10 ** (self.MIN_EXP + (idx + 0.5) / self.BINS_PER_DECADE)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    @property
+    def p50(self) -> Optional[float]:
+        return self.percentile(50)
+
+    @property
+    def p95(self) -> Optional[float]:
+        return self.percentile(95)
+
+    @property
+    def p99(self) -> Optional[float]:
+        return self.percentile(99)
+
+
+class Aggregator:
+    """
+    Base class of the aggregators of the values reported to the progress bar (See the `aggregate` parameter). Adding a
+    value is O(1) and does not convert it: the raw values (Python numbers, NumPy scalars, 0-d arrays, tensors...) are
+    kept until the aggregate is read, usually once per frame. Then, they are converted to float and folded in the
+    aggregate.
+
+    To make your own aggregator, subclass this class and implement `fold` and `result`.
+    """
+    # Fold the pending values when there are too many, to bound the memory between two frames
+    MAX_PENDING = 1024
+
+    def __init__(self):
+        self._pending = []
+        self.n = 0
+
+    def add(self, value):
+        """
+        Add a value. The value is not converted.
+        :param value: Any object that can be converted to float
+        :return: None
+        """
+        self._pending.append(value)
+        if len(self._pending) >= self.MAX_PENDING:
+            self._fold_pending()
+
+    def _fold_pending(self):
+        pending, self._pending = self._pending, []
+        for value in pending:
+            self.n += 1
+            self.fold(float(value))
+
+    def fold(self, value: float):
+        """
+        Update the aggregate with a new value.
+        :param value: The value
+        :return: None
+        """
+        raise NotImplementedError()
+
+    def result(self) -> Optional[float]:
+        """
+        The aggregate of the folded values. None if there is no value.
+        """
+        raise NotImplementedError()
+
+    @property
+    def value(self) -> Optional[float]:
+        """
+        The aggregate of all the values added
+        """
+        if self._pending:
+            self._fold_pending()
+        return self.result()
+
+    def reset(self):
+        """
+        Forget all the values (Ex: at the start of an epoch)
+        :return: None
+        """
+        self._pending = []
+        self.n = 0
+
+
+class Last(Aggregator):
+    """
+    The last value
+    """
+    def __init__(self):
+        super().__init__()
+        self._last = None
+
+    def add(self, value):
+        # Only the last value matters
+        self._pending = [value]
+
+    def fold(self, value: float):
+        self._last = value
+
+    def result(self) -> Optional[float]:
+        return self._last
+
+    def reset(self):
+        super().reset()
+        self._last = None
+
+
+class Mean(Aggregator):
+    """
+    The running mean
+    """
+    def __init__(self):
+        super().__init__()
+        self._sum = 0.
+
+    def fold(self, value: float):
+        self._sum += value
+
+    def result(self) -> Optional[float]:
+        return self._sum / self.n if self.n > 0 else None
+
+    def reset(self):
+        super().reset()
+        self._sum = 0.
+
+
+class EMA(Aggregator):
+    """
+    The exponential moving average, with bias correction (The first values are not biased toward 0).
+    """
+    def __init__(self, smoothing: float = 0.1):
+        """
+        :param smoothing: The weight of a new value, between 0 and 1. The higher, the more reactive.
+        """
+        super().__init__()
+        self.smoothing = smoothing
+        self._ema = 0.
+
+    def fold(self, value: float):
+        self._ema = self.smoothing * value + (1 - self.smoothing) * self._ema
+
+    def result(self) -> Optional[float]:
+        if self.n == 0:
+            return None
+        return self._ema / (1 - (1 - self.smoothing) ** self.n)
+
+    def reset(self):
+        super().reset()
+        self._ema = 0.
+
+
+class Min(Aggregator):
+    """
+    The minimum
+    """
+    def __init__(self):
+        super().__init__()
+        self._min = None
+
+    def fold(self, value: float):
+        if self._min is None or value < self._min:
+            self._min = value
+
+    def result(self) -> Optional[float]:
+        return self._min
+
+    def reset(self):
+        super().reset()
+        self._min = None
+
+
+class Max(Aggregator):
+    """
+    The maximum
+    """
+    def __init__(self):
+        super().__init__()
+        self._max = None
+
+    def fold(self, value: float):
+        if self._max is None or value > self._max:
+            self._max = value
+
+    def result(self) -> Optional[float]:
+        return self._max
+
+    def reset(self):
+        super().reset()
+        self._max = None
+
+
+AGGREGATORS: Dict[str, Callable[[], Aggregator]] = dict(
+    last=Last,
+    mean=Mean,
+    ema=EMA,
+    min=Min,
+    max=Max
+)
+
+def make_aggregator(spec: Union[str, Aggregator]) -> Aggregator:
+    """
+    Make an aggregator from its name (last, mean, ema, min, max) or return the given aggregator.
+    """
+    if isinstance(spec, Aggregator):
+        return spec
+    if spec not in AGGREGATORS:
+        raise ValueError(f"Unknown aggregation: {spec}. Expected one of {', '.join(AGGREGATORS)} or an Aggregator.")
+    return AGGREGATORS[spec]()
+
+
+class WidgetCost:
+    """
+    The cost of a widget: number of calls, cumulative and maximum duration
+    """
+    __slots__ = ("name", "calls", "total_ns", "max_ns")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    @property
+    def total(self) -> float:
+        """
+        The cumulative duration in seconds
+        """
+        return self.total_ns / 1e9
+
+    @property
+    def per_call(self) -> float:
+        """
+        The mean duration of a call in seconds
+        """
+        return self.total_ns / self.calls / 1e9 if self.calls > 0 else 0.
+
+    def __repr__(self):
+        return f"WidgetCost({self.name}, calls={self.calls}, per_call={self.per_call * 1e6:.1f}µs)"
+
+
+class RenderStats:
+    """
+    The cost of rendering the progress bar, per widget and per frame. It is enabled with the `profile` or the
+    `frame_budget` parameter of the progress bar, and readable in `bar.render_stats`:
+    ```
+    bar = progress(loader, profile=True)
+    for batch in bar:
+        ...
+    print(bar.render_stats.summary())
+    ```
+    With a budget, a warning is emitted (Once) when rendering takes more than this share of the loop time.
+    """
+    # The budget is checked after this time, so the first frames do not trigger the warning
+    WARMUP = 1.
+
+    def __init__(self, budget: Optional[float] = None):
+        """
+        :param budget: The maximum share of the loop time spent rendering, between 0 and 1 (Ex: 0.05 for 5%)
+        """
+        self.budget = budget
+        self.widgets: Dict[Callable, WidgetCost] = {}
+        self.frames = 0
+        self.frame_total_ns = 0
+        self.frame_max_ns = 0
+        self.warned = False
+
+    def add_widget(self, widget: Callable, duration_ns: int):
+        """
+        Record a call of a widget.
+        :param widget: The widget
+        :param duration_ns: The duration of the call in nanoseconds
+        :return: None
+        """
+        cost = self.widgets.get(widget)
+        if cost is None:
+            name = getattr(widget, "__qualname__", None) or repr(widget)
+            cost = self.widgets[widget] = WidgetCost(name.replace(".<locals>", ""))
+        cost.calls += 1
+        cost.total_ns += duration_ns
+        if duration_ns > cost.max_ns:
+            cost.max_ns = duration_ns
+
+    def add_frame(self, duration_ns: int):
+        """
+        Record the rendering of a frame, widgets included.
+        :param duration_ns: The duration in nanoseconds
+        :return: None
+        """
+        self.frames += 1
+        self.frame_total_ns += duration_ns
+        if duration_ns > self.frame_max_ns:
+            self.frame_max_ns = duration_ns
+
+    @property
+    def frame_total(self) -> float:
+        """
+        The cumulative rendering time in seconds
+        """
+        return self.frame_total_ns / 1e9
+
+    @property
+    def per_frame(self) -> float:
+        """
+        The mean rendering time of a frame in seconds
+        """
+        return self.frame_total_ns / self.frames / 1e9 if self.frames > 0 else 0.
+
+    def share(self, elapsed: float) -> float:
+        """
+        The share of the loop time spent rendering.
+        :param elapsed: The loop time in seconds
+        """
+        return self.frame_total / elapsed if elapsed > 0 else 0.
+
+    def check_budget(self, elapsed: float) -> Optional[str]:
+        """
+        Check if the rendering exceeds the budget. It returns a message only the first time.
+        :param elapsed: The loop time in seconds
+        :return: The warning message, or None
+        """
+        if self.budget is None or self.warned or elapsed < self.WARMUP:
+            return None
+        share = self.share(elapsed)
+        if share <= self.budget:
+            return None
+        self.warned = True
+        slowest = max(self.widgets.values(), key=lambda cost: cost.total_ns, default=None)
+        msg = f"Rendering the progress bar takes {share:.1%} of the loop time (Budget: {self.budget:.1%})."
+        if slowest is not None:
+            msg += f" The most expensive widget is {slowest.name} ({slowest.per_call * 1e6:.1f}µs per call)."
+        return msg
+
+    def summary(self) -> str:
+        """
+        A table of the cost of each widget and of the frames, the most expensive first.
+        """
+        lines = [f"{'widget':<40} {'calls':>8} {'total (ms)':>12} {'per call (µs)':>14} {'max (µs)':>10}"]
+        for cost in sorted(self.widgets.values(), key=lambda cost: cost.total_ns, reverse=True):
+            lines.append(f"{cost.name[:40]:<40} {cost.calls:>8} {cost.total_ns / 1e6:>12.3f} "
+                         f"{cost.per_call * 1e6:>14.1f} {cost.max_ns / 1e3:>10.1f}")
+        lines.append(f"{'frame':<40} {self.frames:>8} {self.frame_total_ns / 1e6:>12.3f} "
+                     f"{self.per_frame * 1e6:>14.1f} {self.frame_max_ns / 1e3:>10.1f}")
+        return "\n".join(lines)
@@ -0,0 +1,142 @@
+import os
+import weakref
+import multiprocessing
+from multiprocessing import shared_memory
+from multiprocessing.context import get_spawning_popen
+from typing import *
+
+# Counters attached in this process, by shared memory name. (shm, view, slot)
+_ATTACHED: Dict[str, Tuple[shared_memory.SharedMemory, memoryview, int]] = {}
+# Instances that claimed a slot. A forked child must not reuse the slot of its parent.
+_CLAIMED: 'weakref.WeakSet[SharedCounters]' = weakref.WeakSet()
+
+def _reset_after_fork():
+    _ATTACHED.clear()
+    for counters in _CLAIMED:
+        counters._slot = None
+    _CLAIMED.clear()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class SharedCounters:
+    """
+    A block of counters in shared memory, one slot per process. Each process increments its own slot, so no lock or
+    inter-process communication is needed when counting. The owner (parent process) reads all the slots to get the
+    total count and the count of each worker.
+
+    A slot is claimed once per process, the first time it counts. This requires a lock that can only be passed to the
+    worker processes when they are created. So, either use the fork start method, or give the `attach` method as
+    initializer of the pool:
+    ```
+    counters = SharedCounters(8)
+    with ProcessPoolExecutor(8, initializer=counters.attach) as ex:
+        ex.map(work, items)
+    ```
+    After that, the counters can be given to the tasks as argument, or the tasks can call `counters.add()` on a global
+    reference.
+
+    Usually, you do not create this object yourself. It is created by the progress bar with the `workers` parameter.
+    """
+    def __init__(self, n_slots: int):
+        """
+        :param n_slots: The maximum number of processes that can count
+        """
+        if n_slots < 1:
+            raise ValueError(f"The number of slots must be at least 1, got {n_slots}")
+        self.n_slots = n_slots
+        # One int64 per slot + the index of the next free slot
+        self._shm = shared_memory.SharedMemory(create=True, size=8 * (n_slots + 1))
+        self.name = self._shm.name
+        self._view = self._shm.buf.cast("q")
+        for i in range(n_slots + 1):
+            self._view[i] = 0
+        # A lock from the spawn context can be shared with processes of any start method
+        self._lock = multiprocessing.get_context("spawn").Lock()
+        self._owner = os.getpid()
+        self._slot: Optional[int] = None
+
+    def __getstate__(self):
+        # The lock can only be pickled when a process is spawned (Inheritance). Otherwise, it is dropped, and the
+        # receiving process must already be attached.
+        lock = self._lock if get_spawning_popen() is not None else None
+        return dict(n_slots=self.n_slots, name=self.name, lock=lock, owner=self._owner)
+
+    def __setstate__(self, state):
+        self.n_slots = state["n_slots"]
+        self.name = state["name"]
+        self._lock = state["lock"]
+        self._owner = state["owner"]
+        self._shm = None
+        self._view = None
+        self._slot = None
+
+    def attach(self):
+        """
+        Claim a slot for the current process. It is called automatically the first time the process counts, but it can
+        also be used as the initializer of a process pool.
+        :return: None
+        """
+        if self.name in _ATTACHED:
+            self._shm, self._view, self._slot = _ATTACHED[self.name]
+            _CLAIMED.add(self)
+            return
+        if self._lock is None:
+            raise RuntimeError("This process can't claim a counter slot. Give the `attach` method as initializer of the "
+                               "pool (initializer=counters.attach), or use the fork start method.")
+        if self._shm is None:
+            self._shm = shared_memory.SharedMemory(name=self.name)
+            self._view = self._shm.buf.cast("q")
+        with self._lock:
+            slot = self._view[self.n_slots]
+            if slot >= self.n_slots:
+                raise RuntimeError(f"More than {self.n_slots} processes are counting. Increase the number of workers "
+                                   f"of the progress bar.")
+            self._view[self.n_slots] = slot + 1
+        self._slot = slot
+        _ATTACHED[self.name] = (self._shm, self._view, slot)
+        _CLAIMED.add(self)
+
+    def add(self, n: int = 1):
+        """
+        Increment the slot of the current process.
+        :param n: The increment
+        :return: None
+        """
+        if self._slot is None:
+            self.attach()
+        self._view[self._slot] += n
+
+    @property
+    def n_active(self) -> int:
+        """
+        The number of slots that were claimed
+        """
+        return self._view[self.n_slots]
+
+    def counts(self) -> List[int]:
+        """
+        Read the count of each claimed slot.
+        """
+        return self._view[:self.n_active].tolist()
+
+    def total(self) -> int:
+        """
+        The sum of all slots
+        """
+        return sum(self._view[:self.n_active])
+
+    def close(self):
+        """
+        Release the shared memory. If called by the owner, the shared memory is also destroyed.
+        """
+        if self._shm is None:
+            return
+        _ATTACHED.pop(self.name, None)
+        self._view.release()
+        self._view = None
+        self._shm.close()
+        if os.getpid() == self._owner:
+            self._shm.unlink()
+        self._shm = None
@@ -1,6 +1,13 @@
+import os
+import sys
 import time
+import asyncio
+import inspect
+import functools
 import threading
-from typing import Union, Literal
+from typing import Union, Literal, Dict, Optional, Callable, TypeVar
+
+F = TypeVar("F", bound=Callable)
 moon = tuple("🌑🌒🌓🌔🌕🌖🌗🌘")
 modern = tuple("⠋⠙⠹⠸⠼⠴⠦⠧⠇⠏")
 legacy = ("[|]", "[/]", "[-]", "[\\]")
@@ -11,48 +18,135 @@ globe = ('🌍','🌎','🌏')
 clock = ('🕐','🕑','🕒','🕓','🕔','🕕','🕖','🕗','🕘','🕙','🕚','🕛')
 wave = ('▁','▃','▄','▅','▆','▇','▆','▅','▄','▃')
 
+FRAMES = {
+    'legacy': legacy,
+    'modern': modern,
+    'trig': trig,
+    'circle': circle,
+    'bounce': bounce,
+    'wave': wave,
+    'moon': moon,
+    'globe': globe,
+    'clock': clock
+}
+
+def get_frames(name: str) -> tuple[str]:
+    """
+    Get a frame set by its name
+    :param name: The name of the frame set: legacy, modern, trig, circle, bounce, wave, moon, globe or clock
+    :return: The frames
+    """
+    if name not in FRAMES:
+        raise ValueError(f"Unknown spinner type: {name}")
+    return FRAMES[name]
+
+class _Ticker:
+    """
+    A single daemon thread that draws all the active spinners. It waits on an event instead of sleeping, so spinners can
+    be added and removed at any time without waiting for the next frame. The frames of the spinners that are due are
+    written with one write per tick.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        # Active spinners, in the order they were started
+        self._spinners: Dict['Spinner', None] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, spinner: 'Spinner'):
+        with self._lock:
+            spinner._next_tick = time.monotonic()
+            self._spinners[spinner] = None
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._wake.set()
+
+    def remove(self, spinner: 'Spinner'):
+        # The frames are written while holding the lock, so the spinner can't be drawn once it is removed
+        with self._lock:
+            self._spinners.pop(spinner, None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                out = []
+                next_tick = None
+                for spinner in self._spinners:
+                    if now >= spinner._next_tick:
+                        out.append(spinner._frames[spinner._pointer])
+                        spinner._pointer = (spinner._pointer + 1) % len(spinner._frames)
+                        spinner._next_tick += spinner._period
+                        if spinner._next_tick < now:
+                            # Late (Slow terminal): skip the missed frames
+                            spinner._next_tick = now + spinner._period
+                    if next_tick is None or spinner._next_tick < next_tick:
+                        next_tick = spinner._next_tick
+                if len(out) > 0:
+                    try:
+                        sys.stdout.write("".join(out))
+                        sys.stdout.flush()
+                    except (OSError, ValueError):
+                        # The standard output was closed
+                        pass
+                # Cleared while holding the lock, so a spinner added after this point wakes the thread up
+                self._wake.clear()
+            self._wake.wait(max(next_tick - time.monotonic(), 0.) if next_tick is not None else None)
+
+
+_TICKER = _Ticker()
+
+def _reset_after_fork():
+    # The thread of the parent does not exist in the child
+    global _TICKER
+    _TICKER = _Ticker()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
 class Spinner:
+    """
+    Display an animated spinner with a description while a task is running. All the active spinners are drawn by one
+    shared thread, so starting and stopping a spinner is immediate.
+
+    In a coroutine, use `async with`: the spinner is then drawn by a task of the running event loop, without any thread.
+    A spinner can also decorate a function or a coroutine function, to spin while it runs:
+    ```
+    @Spinner("Fetching...", chars="moon")
+    async def fetch(url):
+        ...
+    ```
+    """
     def __init__(self, desc: str = "", sep: str = "  ", refresh_rate: float = 4, chars: Union[tuple[str], Literal[
         'legacy','modern', 'trig', 'circle', 'bounce', 'wave', 'moon', 'globe', 'clock'
     ]] = 'modern'):
         if isinstance(chars, str):
-            match chars:
-                case 'legacy':
-                    chars = legacy
-                case 'modern':
-                    chars = modern
-                case 'trig':
-                    chars = trig
-                case 'circle':
-                    chars = circle
-                case 'bounce':
-                    chars = bounce
-                case 'wave':
-                    chars = wave
-                case 'moon':
-                    chars = moon
-                case 'globe':
-                    chars = globe
-                case 'clock':
-                    chars = clock
-                case _:
-                    raise ValueError(f"Unknown spinner type: {chars}")
+            chars = get_frames(chars)
         self.chars = chars
         self.desc = desc
         self.sep = sep
         self.refresh_rate = refresh_rate
+        self._frames: tuple[str, ...] = ()
+        self._pointer = 0
+        self._period = 1 / refresh_rate
+        self._next_tick = 0.
+        self._task: Optional[asyncio.Task] = None
+
+    def _prepare(self):
+        # The frames are rendered once, the ticker (or the task) only writes them
+        self._frames = tuple(f"\033[2K\r{char}{self.sep}{self.desc}" for char in self.chars)
+        self._pointer = 0
+        self._period = 1 / self.refresh_rate
 
     def start(self) -> 'Spinner':
-        self._stop_event = threading.Event()
-        self._runner = threading.Thread(target=self.spinner,
-                                        args=(self._stop_event, self.chars, self.desc, self.sep, self.refresh_rate**-1),
-                                        daemon=True)
-        self._runner.start()
+        self._prepare()
+        _TICKER.add(self)
         return self
 
     def stop(self) -> 'Spinner':
-        self._stop_event.set()
-        self._runner.join()
+        _TICKER.remove(self)
         return self
 
     def __enter__(self) -> 'Spinner':
@@ -63,11 +157,67 @@ class Spinner:
         print(f"\033[2K\r", end="", flush=True)
         return False
 
+    async def _spin(self):
+        frames = self._frames
+        while True:
+            try:
+                sys.stdout.write(frames[self._pointer])
+                sys.stdout.flush()
+            except (OSError, ValueError):
+                pass
+            self._pointer = (self._pointer + 1) % len(frames)
+            await asyncio.sleep(self._period)
+
+    async def __aenter__(self) -> 'Spinner':
+        self._prepare()
+        self._task = asyncio.get_running_loop().create_task(self._spin())
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> bool:
+        # The event loop is single threaded, so the task can't be drawing right now, and it won't draw once cancelled
+        self._task.cancel()
+        self._task = None
+        print(f"\033[2K\r", end="", flush=True)
+        return False
+
+    def __call__(self, fn: F) -> F:
+        """
+        Decorate a function or a coroutine function to display the spinner while it runs. Each call gets its own
+        spinner, so concurrent calls do not share their state.
+        :param fn: The function
+        :return: The decorated function
+        """
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                async with self._copy():
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self._copy():
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def _copy(self) -> 'Spinner':
+        return Spinner(self.desc, self.sep, self.refresh_rate, self.chars)
+
     @staticmethod
     def spinner(stop_event, chars: list[str], desc: str, sep: str = "  ", delay: float = 0.25):
+        """
+        Draw a spinner in the current thread until the event is set. The spinners no longer use it (They are drawn by
+        a shared thread), it is kept for the code that runs it in its own thread.
+        :param stop_event: The event that stops the spinner (Ex: a `threading.Event`)
+        :param chars: The frames of the spinner
+        :param desc: The description displayed after the frames
+        :param sep: The separator between the frame and the description
+        :param delay: The time between two frames, in seconds
+        :return: None
+        """
+        frames = tuple(f"\033[2K\r{char}{sep}{desc}" for char in chars)
         pointer = 0
         while not stop_event.is_set():
-            print(f'\033[2K\r{chars[pointer]}{sep}{desc}', end="")
-            pointer += 1
-            pointer %= len(chars)
-            time.sleep(delay)
\ No newline at end of file
+            print(frames[pointer], end="", flush=True)
+            pointer = (pointer + 1) % len(frames)
+            time.sleep(delay)
@@ -0,0 +1,17 @@
+import io
+import contextlib
+import pytest
+from pyutils import progress
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_advance_finishes_at_total(threaded):
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        bar = progress(total=100, threaded=threaded, output="text", refresh_rate=0.01)
+        for _ in range(25):
+            bar.advance(4)
+    assert bar.iter_ended
+    assert bar._renderer is None
+    assert out.getvalue().count("done") == 1
+
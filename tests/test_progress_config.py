@@ -0,0 +1,68 @@
+import io
+import contextlib
+from pyutils import progress
+from pyutils.progress import format_total
+
+
+def test_set_parameter_derives_config():
+    bar = progress(range(3))
+    other = progress(range(3))
+    bar.post_cb = (format_total,)
+    bar.refresh_rate = 0.5
+    assert bar.post_cb == (format_total,)
+    assert bar.refresh_rate == 0.5
+    assert bar._refresh_ns == 500_000_000
+    # The other bars of the same type are not changed
+    assert other.config is progress.CONFIGS["default"]
+    assert other.refresh_rate == progress.CONFIGS["default"].refresh_rate
+
+
+def test_set_parameter_to_none():
+    bar = progress(range(3), type="pip")
+    assert bar.done_color is not None
+    bar.done_color = None
+    assert bar.done_color is None
+
+
+def test_set_spinner_resolves_frames():
+    bar = progress(range(3))
+    bar.spinner = "legacy"
+    assert bar.spinner == ("[|]", "[/]", "[-]", "[\\]")
+
+
+def test_user_attributes():
+    bar = progress(range(3), display=False)
+    bar.epoch = 3
+    assert bar.epoch == 3
+
+
+def test_set_post_cb_renders():
+    out = io.StringIO()
+    bar = progress(range(3), output="tty")
+    bar.post_cb = (format_total,)
+    with contextlib.redirect_stdout(out):
+        for _ in bar:
+            pass
+    assert "3/3" in out.getvalue()
+
+
+def test_stats_created_at_first_step():
+    bar = progress(range(3), display=False)
+    assert bar._stats is None and bar._phase_ns is None
+    for _ in bar:
+        pass
+    assert bar._stats is not None
+    assert bar.phase_times == {}
+
+
+def test_reset_removes_aggregates():
+    bar = progress(range(3), display=False, aggregate={"loss": "mean"})
+    for i in bar:
+        bar.report(loss=i, lr=0.1)
+    assert bar.added_values["loss"] == 1
+    bar.reset(range(3))
+    assert "loss" not in bar.added_values
+    assert bar.added_values["lr"] == 0.1
+    for i in bar:
+        bar.report(loss=i + 10)
+    assert bar.aggregates() == {"loss": 11}
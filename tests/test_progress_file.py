@@ -0,0 +1,25 @@
+import io
+import pytest
+from pyutils import progress
+
+
+def test_wrap_file_counts_bytes(tmp_path):
+    path = tmp_path / "data.txt"
+    path.write_text("héllo wörld\n" * 10, encoding="utf-8")
+    with progress.wrap_file(open(path, "rb"), display=False) as f:
+        for chunk in f.chunks(16):
+            pass
+        assert f.bar.total == path.stat().st_size
+        assert f.bar.count == f.bar.total
+
+
+def test_wrap_file_rejects_text_mode(tmp_path):
+    path = tmp_path / "data.txt"
+    path.write_text("héllo wörld\n", encoding="utf-8")
+    with open(path, encoding="utf-8") as f:
+        with pytest.raises(TypeError):
+            progress.wrap_file(f, display=False)
+        # The binary buffer can be wrapped
+        assert progress.wrap_file(f.buffer, display=False).bar.total == path.stat().st_size
+    with pytest.raises(TypeError):
+        progress.wrap_file(io.StringIO("abc"), display=False)
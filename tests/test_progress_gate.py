@@ -0,0 +1,39 @@
+import io
+import time
+import contextlib
+from pyutils import progress
+
+
+class FrameTimes(progress):
+    """
+    Record the time of each frame
+    """
+    def display_loading_bar(self):
+        self.frames.append(time.monotonic())
+        super().display_loading_bar()
+
+
+def fast_then_slow(fast: float, n_slow: int, slow_step: float):
+    end = time.monotonic() + fast
+    i = 0
+    while time.monotonic() < end:
+        yield i
+        i += 1
+    for _ in range(n_slow):
+        time.sleep(slow_step)
+        yield i
+        i += 1
+
+
+def test_bar_redraws_when_items_slow_down():
+    bar = FrameTimes(fast_then_slow(0.3, 100, 0.005), output="tty", refresh_rate=0.05)
+    bar.frames = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in bar:
+            pass
+    slow_start = bar.frames[0] + 0.3
+    # The slow phase lasts at least 0.5s, with a refresh period of 50ms
+    slow_frames = [t for t in bar.frames if t > slow_start + 0.05]
+    assert len(slow_frames) >= 4
+    gaps = [b - a for a, b in zip(slow_frames, slow_frames[1:])]
+    assert max(gaps) < 0.3
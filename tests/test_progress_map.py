@@ -0,0 +1,43 @@
+import io
+import sys
+import contextlib
+from pyutils import progress
+
+# The progress class shadows its module in the package namespace
+progress_module = sys.modules["pyutils.progress"]
+
+
+def square(x):
+    return x * x
+
+
+def test_map_unknown_length_displays_done_bar():
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        results = list(progress.map(square, iter(range(50)), chunksize=4, output="text"))
+    assert results == [x * x for x in range(50)]
+    assert "50 " in out.getvalue() and "done" in out.getvalue()
+
+
+def test_map_unordered_counts_all_items():
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        gen = progress.map(square, range(100), chunksize=7, ordered=False, output="text")
+        results = sorted(gen)
+    assert results == [x * x for x in range(100)]
+    assert out.getvalue().count("done") == 1
+
+
+def test_map_executor_is_created_lazily(monkeypatch):
+    created = []
+    executor_cls = progress_module.ThreadPoolExecutor
+
+    def make_executor(*args, **kwargs):
+        created.append(True)
+        return executor_cls(*args, **kwargs)
+
+    monkeypatch.setattr(progress_module, "ThreadPoolExecutor", make_executor)
+    gen = progress.map(square, range(10), display=False)
+    assert created == []
+    assert list(gen) == [x * x for x in range(10)]
+    assert created == [True]
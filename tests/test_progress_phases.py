@@ -0,0 +1,31 @@
+import time
+import pytest
+from pyutils import progress
+
+
+def test_phase_before_first_item_is_not_subtracted():
+    bar = progress(range(3), phases=True, display=False)
+    with bar.phase("setup"):
+        time.sleep(0.05)
+    for _ in bar:
+        time.sleep(0.001)
+    times = bar.phase_times
+    assert times["compute"] >= 0.002
+    assert times["setup"] >= 0.05
+
+
+def test_phases_are_not_negative():
+    bar = progress(range(5), phases=True, display=False)
+    for _ in bar:
+        with bar.phase("augment"):
+            time.sleep(0.002)
+    assert all(t >= 0 for t in bar.phase_times.values())
+    assert sum(bar.phase_shares.values()) == pytest.approx(1)
+
+
+def test_phases_async_iterable_raises():
+    async def items():
+        yield 1
+
+    with pytest.raises(ValueError):
+        progress(items(), phases=True)
@@ -0,0 +1,39 @@
+import time
+from functools import partial
+from pyutils import progress, WindowedStats
+
+
+def steps_with_tail(n: int, fast: float, slow: float, every: int):
+    for i in range(n):
+        end = time.perf_counter() + (slow if i % every == every - 1 else fast)
+        while time.perf_counter() < end:
+            pass
+        yield i
+
+
+def test_percentiles_measure_each_step():
+    bar = progress(steps_with_tail(2000, 20e-6, 2e-3, 100), display=False,
+                   stats=partial(WindowedStats, percentiles=True))
+    for _ in bar:
+        pass
+    stats = bar.stats
+    assert stats.p50 < 100e-6
+    assert stats.p99 > 1e-3
+    assert stats.max > 1e-3
+
+
+def test_no_distribution_without_percentiles():
+    bar = progress(steps_with_tail(500, 20e-6, 2e-3, 100), display=False)
+    for _ in bar:
+        pass
+    assert bar.stats.p99 is None
+    assert bar.stats.max is None
+
+
+def test_headless_bar_is_timed():
+    bar = progress(steps_with_tail(200, 100e-6, 100e-6, 100), total=200, display=False)
+    for _ in bar:
+        pass
+    assert bar.stats.rate is not None
+    assert bar.rate > 0
+    assert bar.eta is not None
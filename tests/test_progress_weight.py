@@ -0,0 +1,28 @@
+import asyncio
+from pyutils import progress
+
+BATCHES = [[1, 2], [3, 4, 5], [6]]
+
+
+def test_enum_index_for_loop():
+    bar = progress(BATCHES, weight=len, enum=True, display=False)
+    assert [i for i, _ in bar] == [0, 1, 2]
+    assert bar.count == 6
+
+
+def test_enum_index_next():
+    bar = progress(BATCHES, weight=len, enum=True, display=False)
+    assert [next(bar)[0] for _ in BATCHES] == [0, 1, 2]
+    assert bar.count == 6
+
+
+def test_enum_index_async():
+    async def batches():
+        for batch in BATCHES:
+            yield batch
+
+    async def main():
+        bar = progress(batches(), weight=len, enum=True, display=False)
+        return [i async for i, _ in bar], bar.count
+
+    assert asyncio.run(main()) == ([0, 1, 2], 6)
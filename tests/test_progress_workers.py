@@ -0,0 +1,45 @@
+import io
+import time
+import threading
+import contextlib
+from pyutils import progress
+
+
+def run_workers_bar(**kwargs) -> str:
+    """
+    Count in a worker slot from this process while the renderer thread draws the bar.
+    :return: The output of the bar
+    """
+    errors = []
+    hook = threading.excepthook
+    threading.excepthook = lambda args: errors.append(args.exc_value)
+    out = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(out):
+            bar = progress(total=10, workers=4, refresh_rate=0.01, **kwargs)
+            bar.counters.add(3)
+            deadline = time.monotonic() + 2
+            while "3/10" not in out.getvalue() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            bar.counters.add(7)
+            bar.close()
+    finally:
+        threading.excepthook = hook
+    assert errors == []
+    assert bar.count == 10
+    return out.getvalue()
+
+
+def test_workers_bar_renders_text():
+    out = run_workers_bar(output="text", log_interval=0)
+    assert "3/10" in out
+
+
+def test_workers_bar_renders_tty():
+    out = run_workers_bar(output="tty")
+    assert "3/10" in out
+
+
+def test_workers_bar_renders_profiled():
+    out = run_workers_bar(output="tty", profile=True)
+    assert "3/10" in out
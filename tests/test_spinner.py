@@ -0,0 +1,38 @@
+import io
+import time
+import threading
+import contextlib
+from pyutils import Spinner
+
+
+def test_spinner_staticmethod():
+    stop_event = threading.Event()
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        runner = threading.Thread(target=Spinner.spinner, args=(stop_event, ("a", "b"), "desc", " ", 0.01))
+        runner.start()
+        time.sleep(0.05)
+        stop_event.set()
+        runner.join()
+    assert out.getvalue().startswith("\033[2K\ra desc\033[2K\rb desc")
+
+
+def test_decorate_coroutine_function():
+    import asyncio
+    import warnings
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)
+
+        @Spinner("waiting")
+        async def work(x):
+            await asyncio.sleep(0)
+            return x * 2
+
+        @Spinner("waiting")
+        def sync_work(x):
+            return x + 1
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert asyncio.run(work(3)) == 6
+        assert sync_work(3) == 4